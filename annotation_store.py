@@ -0,0 +1,328 @@
+# annotation_store.py – Highlight Stores (in-memory list / SQLite)
+# --------------------------------------------------------------------
+# PdfAnnotator.highlights is one of these.  HighlightList is the
+# default: highlight dicts in memory, indexed by id and by page.
+# SqliteHighlightStore keeps the highlights of very large review sets
+# in "<name>.atnolol.db" (WAL mode, indexed on page and id) and hands
+# out highlight dicts page by page.  Writes collect in one open
+# transaction until commit(), which the auto-save drives.
+#
+# The SQLite store answers tag searches itself, so the sidebar doesn't
+# load and index every row: each row keeps its tag text case-folded
+# (tag_index.tag_text) and an FTS5 trigram table over it, kept current
+# by triggers, makes a query of three letters or more an index lookup.
+# Without the trigram tokenizer (SQLite before 3.34) search() scans the
+# folded column instead.
+#
+# Both hand out ids from a monotonic counter (next_id, saved with the
+# highlights) so a deleted highlight's id is never reused.  Duplicate
+# ids left by older sidecars are renumbered when they are loaded.
+
+import json, sqlite3
+from contextlib import closing
+from pathlib import Path
+
+from tag_index import fold
+
+
+def store_path(sidecar):
+    """Path of the SQLite store that belongs to a sidecar file"""
+    sidecar = Path(sidecar)
+    return sidecar.with_name(sidecar.name + ".db")
+
+
+# ───────────────────────── In-memory store ─────────────────────────
+class HighlightList:
+    """Default store: highlight dicts by id (in insertion order) and by page"""
+
+    durable = False     # persisted by the sidecar journal, not by commit()
+
+    def __init__(self, hls=()):
+        self._by_id = {}
+        self._pages = {}    # page -> {id: hl}
+        self.next_id = 0
+        self.add_many(hls)
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __bool__(self):
+        return bool(self._by_id)
+
+    def new_id(self):
+        """Reserve an id that no highlight has had before"""
+        self.next_id += 1
+        return self.next_id - 1
+
+    def append(self, hl):
+        """Add a highlight, returns True if its id was taken and got renumbered"""
+        renumbered = hl["id"] in self._by_id
+        if renumbered:
+            hl["id"] = self.new_id()
+        self.next_id = max(self.next_id, hl["id"] + 1)
+        self._by_id[hl["id"]] = hl
+        self._pages.setdefault(hl["page"], {})[hl["id"]] = hl
+        return renumbered
+
+    def add_many(self, hls):
+        """Add highlights, returns how many got renumbered"""
+        return sum(self.append(hl) for hl in hls)
+
+    def clear(self):
+        self._by_id.clear()
+        self._pages.clear()
+        self.next_id = 0
+
+    def on_page(self, page):
+        return list(self._pages.get(page, {}).values())
+
+    def get(self, hid):
+        return self._by_id.get(hid)
+
+    def remove_id(self, hid):
+        hl = self._by_id.pop(hid, None)
+        if hl is not None:
+            self._pages[hl["page"]].pop(hid, None)
+
+    def replace(self, hl):
+        """Persist an edited highlight (the dict is already the stored one)"""
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# ───────────────────────── SQLite store ─────────────────────────
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS highlights (
+    rid       INTEGER PRIMARY KEY,
+    id        INTEGER NOT NULL,
+    page      INTEGER NOT NULL,
+    x0 REAL, y0 REAL, x1 REAL, y1 REAL,
+    rgba      INTEGER NOT NULL,
+    text      TEXT NOT NULL,
+    title     TEXT NOT NULL,
+    descr     TEXT NOT NULL,
+    tag       TEXT NOT NULL,
+    folded    TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS hl_page  ON highlights(page);
+CREATE INDEX IF NOT EXISTS hl_id    ON highlights(id);
+DROP INDEX IF EXISTS hl_title;
+DROP INDEX IF EXISTS hl_color;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# External-content FTS rows are removed with the text they were indexed with
+_GRAMS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS hl_grams USING fts5(
+    folded, content='highlights', content_rowid='rid', tokenize='trigram');
+CREATE TRIGGER IF NOT EXISTS hl_grams_ins AFTER INSERT ON highlights BEGIN
+    INSERT INTO hl_grams (rowid, folded) VALUES (new.rid, new.folded);
+END;
+CREATE TRIGGER IF NOT EXISTS hl_grams_del AFTER DELETE ON highlights BEGIN
+    INSERT INTO hl_grams (hl_grams, rowid, folded) VALUES ('delete', old.rid, old.folded);
+END;
+CREATE TRIGGER IF NOT EXISTS hl_grams_upd AFTER UPDATE OF folded ON highlights BEGIN
+    INSERT INTO hl_grams (hl_grams, rowid, folded) VALUES ('delete', old.rid, old.folded);
+    INSERT INTO hl_grams (rowid, folded) VALUES (new.rid, new.folded);
+END;
+"""
+
+_COLS = "id, page, x0, y0, x1, y1, rgba, text, title, descr, tag"
+
+
+def _folded(title, desc):
+    """What search() matches against (same as tag_index.tag_text)"""
+    return fold(title) + "\n" + fold(desc)
+
+
+def _row(rec):
+    """Column values of a record: _COLS, then folded"""
+    r, g, b, a = rec["color"]
+    tag = rec["tag"]
+    title, desc = tag.get("title", ""), tag.get("desc", "")
+    return (rec["id"], rec["page"], *rec["pdf_rect"], (r << 24) | (g << 16) | (b << 8) | a,
+            rec["text"], title, desc, json.dumps(tag, ensure_ascii=False), _folded(title, desc))
+
+
+def _record(row):
+    hid, page, x0, y0, x1, y1, rgba, text, _, _, tag = row
+    return {
+        "page": page,
+        "pdf_rect": [x0, y0, x1, y1],
+        "color": [(rgba >> 24) & 255, (rgba >> 16) & 255, (rgba >> 8) & 255, rgba & 255],
+        "text": text,
+        "tag": json.loads(tag),
+        "id": hid
+    }
+
+
+def _read_only(path):
+    return closing(sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True))
+
+
+def iter_store(path):
+    """Yield a store's highlight records one row at a time (read-only)"""
+    with _read_only(path) as db:
+        for row in db.execute(f"SELECT {_COLS} FROM highlights ORDER BY rid"):
+            yield _record(row)
+
+
+def read_store(path):
+    """Read a store without opening it for writing: {"original_pdf", "highlights"}"""
+    with _read_only(path) as db:
+        meta = dict(db.execute("SELECT key, value FROM meta"))
+        rows = db.execute(f"SELECT {_COLS} FROM highlights ORDER BY rid")
+        return {"original_pdf": meta.get("original_pdf"),
+                "next_id": int(meta.get("next_id", 0)),
+                "highlights": [_record(row) for row in rows]}
+
+
+class SqliteHighlightStore:
+    """Highlights in an SQLite file; encode/decode convert highlight dicts <-> records"""
+
+    durable = True      # commit() is the save
+
+    def __init__(self, path, encode, decode, original_pdf=None):
+        self.path = str(path)
+        self._encode, self._decode = encode, decode
+        self._pages = {}    # page -> decoded highlights, dropped on writes to that page
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+        self._fold_rows()
+        if original_pdf:
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('original_pdf', ?)",
+                            (original_pdf,))
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+        top = self.db.execute("SELECT MAX(id) FROM highlights").fetchone()[0]
+        self.next_id = max(int(row[0]) if row else 0, 0 if top is None else top + 1)
+        self.renumbered = self._renumber_duplicates()
+        self.commit()
+
+    def _fold_rows(self):
+        """Set up search: the folded column (stores from before it get it
+        filled in) and, where SQLite has the trigram tokenizer, its index"""
+        db = self.db
+        if "folded" not in {col[1] for col in db.execute("PRAGMA table_info(highlights)")}:
+            db.execute("ALTER TABLE highlights ADD COLUMN folded TEXT NOT NULL DEFAULT ''")
+            rows = db.execute("SELECT rid, title, descr FROM highlights").fetchall()
+            db.executemany("UPDATE highlights SET folded = ? WHERE rid = ?",
+                           ((_folded(title, desc), rid) for rid, title, desc in rows))
+        fresh = db.execute("SELECT 1 FROM sqlite_master WHERE name = 'hl_grams'").fetchone() is None
+        try:
+            db.executescript(_GRAMS)
+            self.grams = True
+        except sqlite3.OperationalError:
+            self.grams = False      # no trigram tokenizer: scan instead
+            return
+        if fresh:
+            db.execute("INSERT INTO hl_grams (hl_grams) VALUES ('rebuild')")
+
+    def _renumber_duplicates(self):
+        """Give rows that share an id with an earlier row fresh ids"""
+        dupes = self.db.execute("SELECT rid FROM highlights h WHERE EXISTS (SELECT 1 FROM "
+                                "highlights o WHERE o.id = h.id AND o.rid < h.rid)").fetchall()
+        for (rid,) in dupes:
+            self.db.execute("UPDATE highlights SET id = ? WHERE rid = ?", (self.new_id(), rid))
+        return len(dupes)
+
+    def new_id(self):
+        """Reserve an id that no highlight has had before"""
+        self.next_id += 1
+        return self.next_id - 1
+
+    # -------- list-like API used by PdfAnnotator --------
+    def __iter__(self):
+        rows = self.db.execute(f"SELECT {_COLS} FROM highlights ORDER BY rid")
+        return (self._decode(_record(row)) for row in rows)
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM highlights").fetchone()[0]
+
+    def __bool__(self):
+        return self.db.execute("SELECT 1 FROM highlights LIMIT 1").fetchone() is not None
+
+    def append(self, hl):
+        self.add_many([hl])
+
+    def add_many(self, hls):
+        """Insert a batch of highlights in the current transaction, returns how many got renumbered"""
+        hls, batch, renumbered = list(hls), set(), 0
+        for hl in hls:
+            if hl["id"] in batch or self.db.execute(
+                    "SELECT 1 FROM highlights WHERE id = ? LIMIT 1", (hl["id"],)).fetchone():
+                hl["id"] = self.new_id()
+                renumbered += 1
+            batch.add(hl["id"])
+            self.next_id = max(self.next_id, hl["id"] + 1)
+        self.db.executemany(f"INSERT INTO highlights ({_COLS}, folded) "
+                            "VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+                            (_row(self._encode(hl)) for hl in hls))
+        self._pages.clear()
+        return renumbered
+
+    def clear(self):
+        self.db.execute("DELETE FROM highlights")
+        self._pages.clear()
+        self.next_id = 0
+
+    # -------- queries --------
+    def on_page(self, page):
+        if page not in self._pages:
+            rows = self.db.execute(
+                f"SELECT {_COLS} FROM highlights WHERE page = ? ORDER BY rid", (page,))
+            self._pages[page] = [self._decode(_record(row)) for row in rows]
+        return self._pages[page]
+
+    def get(self, hid):
+        row = self.db.execute(f"SELECT {_COLS} FROM highlights WHERE id = ? LIMIT 1",
+                              (hid,)).fetchone()
+        return self._decode(_record(row)) if row else None
+
+    def search(self, query, limit=None):
+        """(ids of the highlights whose tag title or description contains query,
+        total match count), like TagIndex.search: ids in insertion order, at
+        most limit of them"""
+        query = fold(query)
+        if not query:
+            return [], 0
+        if self.grams and len(query) >= 3:
+            source = "hl_grams g JOIN highlights h ON h.rid = g.rowid"
+            match, arg = "hl_grams MATCH ?", '"' + query.replace('"', '""') + '"'
+        else:
+            source, match, arg = "highlights h", "instr(h.folded, ?) > 0", query
+        total = self.db.execute(f"SELECT COUNT(*) FROM {source} WHERE {match}",
+                                (arg,)).fetchone()[0]
+        rows = self.db.execute(f"SELECT h.id FROM {source} WHERE {match} ORDER BY h.rid LIMIT ?",
+                               (arg, -1 if limit is None else limit))
+        return [hid for (hid,) in rows], total
+
+    # -------- edits --------
+    def remove_id(self, hid):
+        for (page,) in self.db.execute("SELECT page FROM highlights WHERE id = ?", (hid,)):
+            self._pages.pop(page, None)
+        self.db.execute("DELETE FROM highlights WHERE id = ?", (hid,))
+
+    def replace(self, hl):
+        """Write an edited highlight back"""
+        row = _row(self._encode(hl))
+        self.db.execute("UPDATE highlights SET page=?, x0=?, y0=?, x1=?, y1=?, rgba=?, "
+                        "text=?, title=?, descr=?, tag=?, folded=? WHERE id = ?",
+                        (*row[1:], row[0]))
+        self._pages.pop(hl["page"], None)
+
+    def commit(self):
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('next_id', ?)", (str(self.next_id),))
+        self.db.commit()
+
+    def close(self):
+        self.commit()
+        self.db.close()
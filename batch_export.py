@@ -0,0 +1,148 @@
+# batch_export.py – Headless Batch Export of Annotated PDFs
+# --------------------------------------------------------------------
+# Exports every PDF + .atnolol pair of a directory (or a manifest) to
+# annotated PDFs without the GUI, one document per worker process.
+#
+# Pairs: "<name>.pdf" with "<name>.atnolol" next to it (its journal or
+# SQLite store included), the same pairing the viewer uses.  A manifest
+# is a JSON list of {"pdf": ..., "sidecar": ..., "output": ...} entries
+# (sidecar and output optional, relative paths resolve against the
+# manifest's folder).
+#
+# Outputs that are up to date are skipped: every export remembers its
+# source, profile and page hashes (see pdf_export.py), so an unchanged
+# pair costs a sidecar read and a hash, and a changed one only redraws
+# the pages that changed.  A JSON summary with per-document timings and
+# errors is written next to the outputs.
+#
+# Usage:  python batch_export.py reviewed/ --out exported/ [--jobs 8] [--profile smallest]
+#         python batch_export.py nightly.json --out exported/ --summary summary.json
+
+import json, os, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from pdf_export import PROFILE_BALANCED, PROFILES, STYLE_ANNOTS, STYLE_DRAWN, export_annotated
+
+SUMMARY_NAME = "batch_summary.json"
+
+
+def _sidecar_exists(sidecar):
+    from annotation_store import store_path
+    return sidecar.exists() or store_path(sidecar).exists()
+
+
+def find_pairs(folder, out_dir, recursive=False):
+    """(pdf, sidecar, output) for every PDF in folder that has a sidecar"""
+    folder, out_dir = Path(folder), Path(out_dir)
+    pairs = []
+    for pdf in sorted(folder.rglob("*.pdf") if recursive else folder.glob("*.pdf")):
+        if out_dir.resolve() in pdf.resolve().parents:
+            continue    # an earlier batch's output
+        sidecar = pdf.with_suffix(".atnolol")
+        if _sidecar_exists(sidecar):
+            pairs.append((pdf, sidecar, out_dir / pdf.relative_to(folder)))
+    return pairs
+
+
+def read_manifest(path, out_dir):
+    """(pdf, sidecar, output) for every entry of a JSON manifest"""
+    path, out_dir = Path(path), Path(out_dir)
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    pairs = []
+    for entry in entries:
+        pdf = path.parent / entry["pdf"]
+        sidecar = (path.parent / entry["sidecar"] if entry.get("sidecar")
+                   else pdf.with_suffix(".atnolol"))
+        out = path.parent / entry["output"] if entry.get("output") else out_dir / pdf.name
+        pairs.append((pdf, sidecar, out))
+    return pairs
+
+
+def export_pair(pdf, sidecar, out, options):
+    """Worker: export one pair, returns its summary entry (errors included)"""
+    from sidecar import load_sidecar
+    entry = {"pdf": str(pdf), "sidecar": str(sidecar), "output": str(out)}
+    t0 = time.perf_counter()
+    try:
+        records = load_sidecar(sidecar)["highlights"]
+        Path(out).parent.mkdir(parents=True, exist_ok=True)
+        stats = export_annotated(str(pdf), records, out, **options)
+    except Exception as e:
+        entry.update(status="failed", error=f"{type(e).__name__}: {e}")
+    else:
+        up_to_date = stats["incremental"] and stats["pages"] == 0
+        entry.update(status="up-to-date" if up_to_date else "exported",
+                     highlights=len(records), pages=stats["pages"],
+                     incremental=stats["incremental"], bytes=stats["bytes"])
+    entry["seconds"] = round(time.perf_counter() - t0, 3)
+    return entry
+
+
+def run_batch(pairs, options, jobs=None, report=print):
+    """Export pairs on a pool of jobs processes; returns the summary dict"""
+    started, t0 = time.strftime("%Y-%m-%dT%H:%M:%S"), time.perf_counter()
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(pairs) or 1))
+    entries = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(export_pair, pdf, sidecar, out, options)
+                   for pdf, sidecar, out in pairs]
+        for future in as_completed(futures):
+            entry = future.result()
+            entries.append(entry)
+            if report:
+                detail = entry.get("error") or f"{entry['pages']} pages drawn"
+                report(f"  {entry['status']:<10} {Path(entry['pdf']).name} "
+                       f"({entry['seconds']:.2f}s, {detail})")
+    entries.sort(key=lambda e: e["pdf"])
+    counts = {status: sum(e["status"] == status for e in entries)
+              for status in ("exported", "up-to-date", "failed")}
+    return {"started": started, "seconds": round(time.perf_counter() - t0, 3), "jobs": jobs,
+            "options": options, "counts": counts, "documents": entries}
+
+
+# ───────────────────────── CLI ─────────────────────────
+def main(argv=None):
+    import argparse
+    from sidecar import atomic_write
+
+    ap = argparse.ArgumentParser(
+        description="Export annotated PDFs for PDF + .atnolol pairs without the GUI")
+    ap.add_argument("input", help="folder of PDFs with sidecars, or a JSON manifest")
+    ap.add_argument("--out", required=True, help="folder for the annotated PDFs")
+    ap.add_argument("--jobs", type=int, help="worker processes (default: one per core)")
+    ap.add_argument("--recursive", action="store_true", help="also look in subfolders")
+    ap.add_argument("--profile", choices=list(PROFILES), default=PROFILE_BALANCED)
+    ap.add_argument("--style", choices=[STYLE_DRAWN, STYLE_ANNOTS], default=STYLE_DRAWN)
+    ap.add_argument("--no-tags", action="store_true", help="highlights only, no tabs or bubbles")
+    ap.add_argument("--downsample", type=int, metavar="DPI", help="downsample photos to DPI")
+    ap.add_argument("--force", action="store_true", help="re-export even if up to date")
+    ap.add_argument("--summary", help=f"summary JSON path (default: <out>/{SUMMARY_NAME})")
+    args = ap.parse_args(argv)
+
+    out_dir = Path(args.out)
+    if Path(args.input).is_dir():
+        if out_dir.resolve() == Path(args.input).resolve():
+            ap.error("--out must not be the input folder")
+        pairs = find_pairs(args.input, out_dir, args.recursive)
+    else:
+        pairs = read_manifest(args.input, out_dir)
+    options = {"style": args.style, "tags": not args.no_tags, "profile": args.profile,
+               "downsample": args.downsample, "incremental": not args.force}
+
+    print(f"Exporting {len(pairs)} documents to {out_dir}...")
+    summary = run_batch(pairs, options, args.jobs)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    summary_path = Path(args.summary) if args.summary else out_dir / SUMMARY_NAME
+    atomic_write(summary_path, json.dumps(summary, indent=2).encode("utf-8"))
+
+    c = summary["counts"]
+    print(f"Done in {summary['seconds']:.2f}s on {summary['jobs']} workers: "
+          f"{c['exported']} exported, {c['up-to-date']} up to date, {c['failed']} failed "
+          f"(summary: {summary_path})")
+    return 1 if c["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
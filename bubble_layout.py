@@ -0,0 +1,126 @@
+# bubble_layout.py – Collision-Free Tag Bubble Layout
+# --------------------------------------------------------------------
+# Places the tag bubbles of one page in its margins so that none
+# overlap.  The margins are what lies around body, the page's content
+# box (the caller measures it; the highlights' own extent otherwise).
+# Bubbles sit in vertical lanes: first the lanes that fit in the right
+# margin, then those of the left margin, each side filled from the body
+# outwards.  A margin narrower than BUBBLE_W gets narrower bubbles; one
+# narrower than MIN_W gets none.  Each bubble wants to start level with
+# its highlight.
+#
+# The layout is a sweep over the bubbles in order of that wanted y.
+# Lanes are kept in two heaps: busy lanes keyed by the bottom of their
+# last bubble, free lanes (already clear at the current y) keyed by
+# lane index.  Each bubble
+#   - goes into the first free lane, exactly level with its highlight
+#   - else slides down under the lane that clears first, if that moves it
+#     less than MAX_SHIFT
+#   - else opens a new lane, while the margins have lanes left
+#   - else takes the next cell of the bottom band: the space under the
+#     body, filled row by row with BAND_W wide bubbles
+#   - else slides down under the first lane to clear
+# A lane holding as many bubbles as fit in the page height leaves the
+# heaps.  A second pass walks each lane bottom-up and pushes bubbles
+# that slid past the page bottom back up.  A page with n bubbles takes
+# O(n log n), hundreds of tags included.  Only once the margins and the
+# band are full do further bubbles overlap others, in the margin lanes
+# level with their highlight (over the body only on a page without
+# margins).
+#
+# Plain numbers in and out (no PyMuPDF), rects are (x0, y0, x1, y1).
+
+import heapq
+
+BUBBLE_W = 180.0    # bubble size in PDF points
+BUBBLE_H = 25.0
+GAP = 4.0           # vertical space between bubbles in a lane
+MARGIN = 10.0       # distance kept from the page edges
+SPACE = 6.0         # distance kept from the body and between lanes
+MIN_W = 40.0        # narrowest bubble worth putting in a margin
+BAND_W = 120.0      # bubble width in the bottom band
+MAX_SHIFT = 3 * BUBBLE_H    # how far a bubble slides before a new lane is opened
+
+
+def _lanes(x0, x1, width, body_left):
+    """(x, width) of the lanes between x0 and x1, the one nearest the body
+    (left of x0 if body_left, else right of x1) first"""
+    room = x1 - x0
+    width = min(width, room)
+    if width < MIN_W:
+        return []
+    n = int((room + SPACE) // (width + SPACE))
+    if body_left:
+        return [(x0 + k * (width + SPACE), width) for k in range(n)]
+    return [(x1 - width - k * (width + SPACE), width) for k in range(n)]
+
+
+def _band(page_width, page_height, body_bottom, height):
+    """(x, y, width) cells of the band under the body, row by row"""
+    x0, x1 = MARGIN, page_width - MARGIN
+    width = min(BAND_W, x1 - x0)
+    cols = int((x1 - x0 + SPACE) // (width + SPACE))
+    y, cells = body_bottom + SPACE, []
+    while width >= MIN_W and y + height <= page_height - MARGIN:
+        cells += [(x0 + k * (width + SPACE), y, width) for k in range(cols)]
+        y += height + GAP
+    return cells
+
+
+def layout_bubbles(page_width, page_height, anchors, body=None, width=BUBBLE_W, height=BUBBLE_H):
+    """Bubble rects for the highlight rects in anchors (same order), in the
+    margins around body (x0, y0, x1, y1) and not overlapping unless those are full"""
+    if not anchors:
+        return []
+    if body is None:
+        body = (min(a[0] for a in anchors), min(a[1] for a in anchors),
+                max(a[2] for a in anchors), max(a[3] for a in anchors))
+    width = max(1.0, min(width, page_width - 2 * MARGIN))
+    top, bottom = MARGIN, page_height - MARGIN
+    lanes = (_lanes(body[2] + SPACE, page_width - MARGIN, width, True) +
+             _lanes(MARGIN, body[0] - SPACE, width, False))
+    band = iter(_band(page_width, page_height, body[3], height))
+    capacity = max(1, int((bottom - top + GAP) // (height + GAP)))
+
+    out = [None] * len(anchors)
+    ys = [0.0] * len(anchors)
+    stacks = []                         # lane -> bubble indices, top to bottom
+    busy, free = [], []                 # busy: (bottom, lane), free: lane
+    for i in sorted(range(len(anchors)), key=lambda i: anchors[i][1]):
+        want = min(max(anchors[i][1], top), max(top, bottom - height))
+        while busy and busy[0][0] + GAP <= want:
+            heapq.heappush(free, heapq.heappop(busy)[1])
+        if free:
+            lane, y = heapq.heappop(free), want
+        elif busy and busy[0][0] + GAP - want <= MAX_SHIFT:
+            end, lane = heapq.heappop(busy)
+            y = end + GAP
+        elif len(stacks) < len(lanes):
+            lane, y = len(stacks), want
+            stacks.append([])
+        else:
+            cell = next(band, None)
+            if cell is not None:
+                x, y, w = cell
+                out[i] = (x, y, x + w, y + height)
+                continue
+            if not busy:
+                # Margins and band are full: overlap, level with the highlight
+                x, w = lanes[i % len(lanes)] if lanes else (page_width - MARGIN - width, width)
+                out[i] = (x, want, x + w, want + height)
+                continue
+            end, lane = heapq.heappop(busy)
+            y = end + GAP
+        ys[i] = y
+        stacks[lane].append(i)
+        if len(stacks[lane]) < capacity:
+            heapq.heappush(busy, (y + height, lane))
+
+    # Push stacks that ran past the bottom back up
+    for (x, w), stack in zip(lanes, stacks):
+        limit = bottom
+        for i in reversed(stack):
+            y = ys[i] = min(ys[i], limit - height)
+            limit = y - GAP
+            out[i] = (x, y, x + w, y + height)
+    return out
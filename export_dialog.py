@@ -7,6 +7,7 @@ from PySide6.QtWidgets import (
     QDialog, QCheckBox, QRadioButton, QButtonGroup, QFrame
 )
 
+from pdf_export import DOWNSAMPLE_DPI
 from ui_components import ACCENT
 
 class ExportOptionsDialog(QDialog):
@@ -14,7 +15,7 @@ class ExportOptionsDialog(QDialog):
         super().__init__(parent)
         self.setWindowTitle("Export Options")
         self.setModal(True)
-        self.resize(400, 250)
+        self.resize(400, 380)
         self.setStyleSheet(f"""
             QDialog {{background:#2a2a2a;color:white;border:2px solid {ACCENT};border-radius:10px}}
             QRadioButton, QCheckBox {{color:white;padding:8px;}}
@@ -54,22 +55,42 @@ class ExportOptionsDialog(QDialog):
         self.full_annotations.setToolTip("Highlights with tabs and tag information")
         self.style_group.addButton(self.full_annotations, 1)
         style_layout.addWidget(self.full_annotations)
+
+        self.editable_annotations = QRadioButton("Editable PDF Annotations")
+        self.editable_annotations.setToolTip(
+            "Native highlight and note annotations: faster, editable in other viewers")
+        self.style_group.addButton(self.editable_annotations, 2)
+        style_layout.addWidget(self.editable_annotations)
         
         # Set default to full annotations
         self.full_annotations.setChecked(True)
         
         layout.addWidget(style_frame)
 
-        # Quality option
+        # Speed / size profile
         options_frame = QFrame()
         options_layout = QVBoxLayout(options_frame)
         
-        options_layout.addWidget(QLabel("⚙️ Quality:"))
+        options_layout.addWidget(QLabel("⚙️ Profile:"))
         
-        self.high_quality = QCheckBox("High Quality Export")
-        self.high_quality.setChecked(True)
-        self.high_quality.setToolTip("Better quality but larger file size")
-        options_layout.addWidget(self.high_quality)
+        self.profile_group = QButtonGroup()
+        self.profile_buttons = {}
+        for name, label, tip in (
+                ("fast", "Fast", "Quickest save, no cleanup: largest file"),
+                ("balanced", "Balanced", "Drops unused objects and packs the rest, still quick"),
+                ("smallest", "Smallest", "Also merges duplicates and recompresses: slowest save")):
+            button = QRadioButton(label)
+            button.setToolTip(tip)
+            self.profile_group.addButton(button)
+            self.profile_buttons[name] = button
+            options_layout.addWidget(button)
+        self.profile_buttons["balanced"].setChecked(True)
+
+        self.downsample = QCheckBox(f"Downsample images to {DOWNSAMPLE_DPI} dpi")
+        self.downsample.setToolTip("Much smaller for scanned PDFs, images lose detail")
+        self.downsample.setEnabled(False)
+        self.profile_buttons["smallest"].toggled.connect(self.downsample.setEnabled)
+        options_layout.addWidget(self.downsample)
         
         layout.addWidget(options_frame)
 
@@ -90,6 +111,10 @@ class ExportOptionsDialog(QDialog):
     def get_export_options(self):
         """Return the selected export options"""
         return {
-            'include_annotations': self.full_annotations.isChecked(),
-            'high_quality': self.high_quality.isChecked()
+            'include_annotations': not self.highlights_only.isChecked(),
+            'style': 'annots' if self.editable_annotations.isChecked() else 'drawn',
+            'profile': next(name for name, button in self.profile_buttons.items()
+                            if button.isChecked()),
+            'downsample': DOWNSAMPLE_DPI if self.downsample.isEnabled()
+                          and self.downsample.isChecked() else None
         }
\ No newline at end of file
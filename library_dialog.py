@@ -0,0 +1,213 @@
+# library_dialog.py – Search Tags Across Documents
+# --------------------------------------------------------------------
+# Searches the tags of every open tab and of the sidecar library
+# (tag_library.py) in one list.  Open tabs are searched through their
+# sidebar's tag index, so unsaved edits are found too, and the library
+# answers for the documents that aren't open.  The library is refreshed
+# on a worker thread when the dialog opens and when a folder is added;
+# results are listed again once the refresh lands.
+#
+# Double-clicking a hit emits open_requested(pdf, highlight id, page,
+# rect): the main window opens (or switches to) the document's tab and
+# centres the highlight.
+
+from pathlib import Path
+
+from PySide6.QtCore import Qt, QThread, QTimer, Signal
+from PySide6.QtWidgets import (
+    QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QDialog, QCheckBox,
+    QComboBox, QFileDialog, QLineEdit, QListWidget, QListWidgetItem
+)
+
+from tag_library import TagLibrary
+from ui_components import ACCENT
+
+
+class LibraryScanWorker(QThread):
+    """Runs TagLibrary.refresh off the GUI thread, on its own connection"""
+
+    progress = Signal(int, int)     # changed sidecars read, total
+    result = Signal(int, int, int)  # read, dropped, failed
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self._cancel = False
+
+    def cancel(self):
+        self._cancel = True
+
+    def run(self):
+        library = TagLibrary(self.path)
+        try:
+            self.result.emit(*library.refresh(progress=self.progress.emit,
+                                              cancelled=lambda: self._cancel))
+        finally:
+            library.close()
+
+
+class LibrarySearchDialog(QDialog):
+    """Tag search over all open tabs and the folders of the sidecar library"""
+
+    DEBOUNCE_MS = 120
+    RESULT_CAP = 200
+
+    open_requested = Signal(str, int, int, list)    # pdf path, highlight id, page, pdf rect
+
+    def __init__(self, panes, parent=None):
+        super().__init__(parent)
+        self.panes = panes      # callable: the open PDFPanes
+        self.library = TagLibrary()
+        self._scan = None
+        self.setWindowTitle("Search All Tags 🌸")
+        self.resize(560, 620)
+        self.setStyleSheet(f"""
+            QDialog {{background:#2a2a2a;color:white;}}
+            QLabel, QCheckBox {{color:white;}}
+            QLineEdit, QComboBox {{background:#3a3a3a;border:2px solid {ACCENT};border-radius:6px;
+                                   color:white;padding:6px;}}
+            QListWidget {{background:#1a1a1a;border:1px solid {ACCENT};border-radius:6px;color:white;}}
+            QListWidget::item {{background:#3a3a3a;border-radius:4px;margin:1px;padding:6px;}}
+            QListWidget::item:selected {{background:{ACCENT};}}
+            QPushButton {{background:{ACCENT};color:white;border:none;border-radius:6px;
+                          padding:6px 12px;font-weight:bold}}
+            QPushButton:hover {{background:#d8b9f1}}
+        """)
+        self.setup_ui()
+        self._show_folders()
+        self.rescan()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(12, 12, 12, 12)
+        layout.setSpacing(8)
+
+        layout.addWidget(QLabel("🔍 Search tags in open tabs and library folders:"))
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Type to search tags...")
+        layout.addWidget(self.search_input)
+        self._debounce = QTimer(self, singleShot=True, interval=self.DEBOUNCE_MS)
+        self._debounce.timeout.connect(self._search)
+        self.search_input.textChanged.connect(self._debounce.start)
+
+        self.results = QListWidget()
+        self.results.setUniformItemSizes(True)
+        self.results.itemDoubleClicked.connect(self._open_hit)
+        layout.addWidget(self.results, 1)
+        self.count_label = QLabel()
+        layout.addWidget(self.count_label)
+
+        # Library folders
+        folders = QHBoxLayout()
+        folders.addWidget(QLabel("🗂 Library:"))
+        self.folder_combo = QComboBox()
+        folders.addWidget(self.folder_combo, 1)
+        remove_btn = QPushButton("➖")
+        remove_btn.setToolTip("Remove this folder from the library")
+        remove_btn.clicked.connect(self._remove_folder)
+        folders.addWidget(remove_btn)
+        layout.addLayout(folders)
+
+        buttons = QHBoxLayout()
+        self.recursive_box = QCheckBox("Include subfolders")
+        buttons.addWidget(self.recursive_box)
+        buttons.addStretch()
+        add_btn = QPushButton("➕ Add Folder")
+        add_btn.clicked.connect(self._add_folder)
+        buttons.addWidget(add_btn)
+        self.rescan_btn = QPushButton("🔄 Rescan")
+        self.rescan_btn.clicked.connect(self.rescan)
+        buttons.addWidget(self.rescan_btn)
+        layout.addLayout(buttons)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+    # -------- library --------
+    def _show_folders(self):
+        self.folder_combo.clear()
+        for folder, recursive in self.library.folders():
+            self.folder_combo.addItem(f"{folder}{' (+ subfolders)' if recursive else ''}", folder)
+        docs, tags = self.library.stats()
+        self.status_label.setText(f"{docs} documents, {tags} tags indexed")
+
+    def _add_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Add Library Folder", str(Path.home()))
+        if folder:
+            self.library.add_folder(folder, self.recursive_box.isChecked())
+            self._show_folders()
+            self.rescan()
+
+    def _remove_folder(self):
+        folder = self.folder_combo.currentData()
+        if folder:
+            self.library.remove_folder(folder)
+            self._show_folders()
+            self.rescan()
+
+    def rescan(self):
+        """Refresh the library index from disk in the background"""
+        if self._scan is not None:
+            return
+        self.rescan_btn.setEnabled(False)
+        self.status_label.setText("Checking library folders...")
+        self._scan = LibraryScanWorker(self.library.path, self)
+        self._scan.progress.connect(
+            lambda done, total: self.status_label.setText(f"Indexing changed sidecars: {done} / {total}"))
+        self._scan.result.connect(self._scan_finished)
+        self._scan.start()
+
+    def _scan_finished(self, read, dropped, failed):
+        self._scan.wait()
+        self._scan = None
+        self.rescan_btn.setEnabled(True)
+        self._show_folders()
+        if failed:
+            self.status_label.setText(self.status_label.text() + f" ({failed} unreadable)")
+        if read or dropped:
+            self._search()
+
+    # -------- search --------
+    def _search(self):
+        query = self.search_input.text()
+        self.results.clear()
+        if not query.strip():
+            self.count_label.setText("")
+            return
+        shown = total = 0
+        open_pdfs = []
+        for pane in self.panes():
+            viewer = pane.viewer
+            if not getattr(viewer, 'doc', None):
+                continue
+            open_pdfs.append(Path(viewer.original_path).resolve())
+            ids, n = pane.sidebar.search_widget.search(query, limit=self.RESULT_CAP - shown)
+            total += n
+            for hid in ids:
+                hl = viewer.highlights.get(hid)
+                if hl is not None:
+                    self._add_hit(viewer.original_path, hid, hl["page"], list(hl["pdf_rect"]),
+                                  hl["tag"].get("title"), "📂")
+                    shown += 1
+        hits, n = self.library.search(query, self.RESULT_CAP - shown, skip=open_pdfs)
+        total += n
+        for hit in hits:
+            self._add_hit(hit["pdf"], hit["id"], hit["page"], hit["pdf_rect"], hit["title"], "🗂")
+        shown += len(hits)
+        self.count_label.setText(f"Showing {shown} of {total} tags")
+
+    def _add_hit(self, pdf, hid, page, rect, title, mark):
+        item = QListWidgetItem(f"📝 {title or 'Untitled'}\n{mark} {Path(pdf).name} · Page {page + 1}")
+        item.setToolTip(str(pdf))
+        item.setData(Qt.UserRole, (str(pdf), hid, page, rect))
+        self.results.addItem(item)
+
+    def _open_hit(self, item):
+        self.open_requested.emit(*item.data(Qt.UserRole))
+
+    def closeEvent(self, event):
+        if self._scan is not None:
+            self._scan.cancel()
+            self._scan.wait()
+            self._scan = None
+        super().closeEvent(event)
@@ -2,9 +2,9 @@
 # --------------------------------------------------------------------
 
 import time
-from PySide6.QtCore import Qt, QTimer, QPropertyAnimation, QEasingCurve
+from PySide6.QtCore import Qt, QTimer, QPropertyAnimation, QEasingCurve, Signal
 from PySide6.QtGui import QFont, QPixmap, QPainter, QColor
-from PySide6.QtWidgets import QDialog, QVBoxLayout, QLabel, QProgressBar
+from PySide6.QtWidgets import QDialog, QVBoxLayout, QLabel, QProgressBar, QPushButton
 
 class SakuraLoadingScreen(QDialog):
     def __init__(self, message="Loading...", parent=None):
@@ -117,12 +117,59 @@ class SakuraLoadingScreen(QDialog):
         self.message_label.setText(new_message)
 
 class ExportLoadingScreen(SakuraLoadingScreen):
+    """Export progress driven by the export worker, with a Cancel button"""
+
+    cancel_requested = Signal()
+
     def __init__(self, parent=None):
         super().__init__("Exporting your annotated PDF...", parent)
+        self.setFixedSize(400, 250)
         self.cute_messages = [
             "Creating beautiful exports... 🌸",
             "Preserving your highlights... 💕", 
             "Making annotations permanent... ✨",
             "Packaging with love... 🎀",
             "Almost done, Riley! 🌺"
-        ]
\ No newline at end of file
+        ]
+
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setStyleSheet(
+            "QPushButton {background:#FFB6C1;color:#8B4B7A;border:none;border-radius:8px;"
+            "padding:6px 18px;font-weight:bold} QPushButton:hover {background:#DDA0DD}")
+        self.cancel_btn.clicked.connect(self.reject)
+        self.layout().addWidget(self.cancel_btn, alignment=Qt.AlignCenter)
+
+        # Progress comes from the worker; the timer only rotates the cute messages
+        self.timer.timeout.disconnect(self.update_progress)
+        self.timer.timeout.connect(self._next_cute_message)
+
+    def start_loading(self, duration_ms=None):
+        """Show the screen and wait for set_progress() calls"""
+        self.show()
+        self.timer.start(600)
+
+    def _next_cute_message(self):
+        self.message_index = (self.message_index + 1) % len(self.cute_messages)
+        self.cute_label.setText(self.cute_messages[self.message_index])
+
+    def set_progress(self, done, total):
+        self.progress.setRange(0, max(total, 1))
+        self.progress.setValue(done)
+        self.update_message(f"Adding your highlights... page {done} of {total}")
+
+    def set_busy(self, message):
+        """Indeterminate progress for a step that doesn't report any (the final save)"""
+        self.progress.setRange(0, 0)
+        self.update_message(message)
+
+    def reject(self):
+        # Esc / Cancel: ask the worker to stop, it closes the screen when it has
+        self.cancel_btn.setEnabled(False)
+        self.update_message("Cancelling export...")
+        self.cancel_requested.emit()
+
+    def close(self):
+        # QDialog.close() would go through reject() and cancel instead
+        self.timer.stop()
+        self.accept()
+        return True
\ No newline at end of file
@@ -26,6 +26,8 @@ try:
         ACCENT, HIGHLIGHT_COLORS, CloseableTabBar, setup_app_palette
     )
     from pdf_annotator import PDFPane
+    from library_dialog import LibrarySearchDialog
+    from sidecar import SIDECAR_WRITER
 except ImportError as e:
     print(f"Error importing application modules: {e}")
     traceback.print_exc()
@@ -78,6 +80,7 @@ class MainWindow(QMainWindow):
             self.tabs.tabCloseRequested.connect(self._close_tab)
             self.tabs.currentChanged.connect(self._tab_changed)
             self.setCentralWidget(self.tabs)
+            self.library_dialog = None      # created on first use
             self._setup_toolbar()
             
             # Auto-save timer
@@ -96,7 +99,7 @@ class MainWindow(QMainWindow):
             print(f"Error: {title} - {message}")
 
     def _autosave_all(self):
-        """Auto-save all open documents"""
+        """Auto-save all open documents (clean ones are skipped)"""
         try:
             for i in range(self.tabs.count()):
                 pane = self.tabs.widget(i)
@@ -116,6 +119,9 @@ class MainWindow(QMainWindow):
     def _tab_changed(self):
         """Update page display when tab changes"""
         self._update_page_display()
+        pane = self._current_pane()
+        self.sqlite_action.setChecked(bool(pane and pane.viewer.highlights.durable))
+        self.native_action.setChecked(bool(pane and pane.viewer.native_mode))
 
     def _setup_toolbar(self):
         try:
@@ -140,6 +146,8 @@ class MainWindow(QMainWindow):
                                  triggered=lambda: self._safe_call(lambda: self._current_pane().save_annotations())))
             tb.addAction(QAction("🖴 Export Final PDF", self,
                                  triggered=lambda: self._safe_call(lambda: self._current_pane().export())))
+            tb.addAction(QAction("📊 Export Report", self,
+                                 triggered=lambda: self._safe_call(lambda: self._current_pane().export_report())))
             tb.addSeparator()
             
             # Navigation with page number
@@ -177,6 +185,7 @@ class MainWindow(QMainWindow):
             # Sidebar toggle
             tb.addAction(QAction("📑 Tags", self,
                                  triggered=lambda: self._safe_call(lambda: self._current_pane().toggle_sidebar())))
+            tb.addAction(QAction("🔎 Search All Tags", self, triggered=self._search_all))
             tb.addAction(QAction("🎨 Preset Manager", self,
                                  triggered=lambda: self._safe_call(lambda: self._current_pane().open_presets())))
             
@@ -184,6 +193,22 @@ class MainWindow(QMainWindow):
             self.text_detection_action = QAction("👁️ Show Text", self, checkable=True)
             self.text_detection_action.triggered.connect(self._toggle_text_detection)
             tb.addAction(self.text_detection_action)
+
+            # SQLite store toggle (for very large review sets)
+            self.sqlite_action = QAction("🗄 SQLite Store", self, checkable=True)
+            self.sqlite_action.setToolTip("Keep this document's tags in an indexed SQLite file")
+            self.sqlite_action.triggered.connect(
+                lambda checked: self._safe_call(lambda:
+                self._current_pane().viewer.use_sqlite_store(checked)))
+            tb.addAction(self.sqlite_action)
+
+            # Native PDF annotations (saved incrementally into the PDF)
+            self.native_action = QAction("📌 Tags in PDF", self, checkable=True)
+            self.native_action.setToolTip("Also save tags into the PDF as highlight annotations")
+            self.native_action.triggered.connect(
+                lambda checked: self._safe_call(lambda:
+                self._current_pane().viewer.set_native_mode(checked)))
+            tb.addAction(self.native_action)
             
             tb.addSeparator()
 
@@ -249,30 +274,87 @@ class MainWindow(QMainWindow):
             
             for path in paths:
                 try:
-                    pane = PDFPane()
-                    if pane.load(path):
-                        self.tabs.addTab(pane, Path(path).name)
-                        self.tabs.setCurrentWidget(pane)
-                        # Connect page change signal
-                        if hasattr(pane.viewer, 'page_changed'):
-                            pane.viewer.page_changed.connect(self._update_page_display)
-                        self._update_page_display()
-                    else:
-                        pane.deleteLater()
+                    self._open_path(path)
                 except Exception as e:
                     self._show_error("File Open Error", f"Failed to open {Path(path).name}: {e}")
                     
         except Exception as e:
             self._show_error("Open Dialog Error", str(e))
 
+    def _open_path(self, path):
+        """Open a PDF in a new tab, returns the pane (None if it didn't load)"""
+        pane = PDFPane()
+        if not pane.load(path):
+            pane.deleteLater()
+            return None
+        self.tabs.addTab(pane, Path(path).name)
+        self.tabs.setCurrentWidget(pane)
+        # Connect page change signal
+        if hasattr(pane.viewer, 'page_changed'):
+            pane.viewer.page_changed.connect(self._update_page_display)
+        pane.viewer.dirty_changed.connect(
+            lambda _, p=pane: self._update_tab_title(p))
+        self._update_tab_title(pane)
+        self._update_page_display()
+        return pane
+
+    def _panes(self):
+        """The PDF panes of all open tabs"""
+        return [self.tabs.widget(i) for i in range(self.tabs.count())]
+
+    def _search_all(self):
+        """Search tags across all open tabs and the sidecar library"""
+        try:
+            if self.library_dialog is None:
+                self.library_dialog = LibrarySearchDialog(self._panes, self)
+                self.library_dialog.open_requested.connect(self._open_hit)
+            else:
+                self.library_dialog.rescan()
+            self.library_dialog.show()
+            self.library_dialog.raise_()
+            self.library_dialog.activateWindow()
+        except Exception as e:
+            self._show_error("Tag Search Error", str(e))
+
+    def _open_hit(self, pdf, hid, page, rect):
+        """Show a search hit: switch to its document's tab (opening it if needed)
+        with the highlight centred"""
+        try:
+            target = Path(pdf).resolve()
+            pane = next((p for p in self._panes() if getattr(p.viewer, 'doc', None)
+                         and Path(p.viewer.original_path).resolve() == target), None)
+            if pane is None:
+                pane = self._open_path(pdf)
+                if pane is None:
+                    return
+            self.tabs.setCurrentWidget(pane)
+            # The tab's own copy is current (and may have moved since indexing)
+            hl = pane.viewer.highlights.get(hid)
+            if hl:
+                page, rect = hl["page"], hl["pdf_rect"]
+            pane.viewer.jump_to_rect(page, rect)
+        except Exception as e:
+            self._show_error("Navigation Error", str(e))
+
+    def _update_tab_title(self, pane):
+        """Show unsaved changes as a dot in front of the tab name"""
+        try:
+            index = self.tabs.indexOf(pane)
+            if index < 0:
+                return
+            name = Path(pane.viewer.original_path).name
+            self.tabs.setTabText(index, f"● {name}" if pane.viewer.is_dirty() else name)
+        except Exception as e:
+            print(f"Tab title update error: {e}")
+
     def _close_tab(self, index):
         """Close a tab and clean up the widget"""
         try:
             widget = self.tabs.widget(index)
             if widget:
-                # Auto-save before closing
-                if hasattr(widget, 'viewer') and hasattr(widget.viewer, '_auto_save'):
-                    widget.viewer._auto_save()
+                # Auto-save and release the document before closing
+                if hasattr(widget, 'viewer') and hasattr(widget.viewer, 'close_document'):
+                    widget.viewer.close_document()
                 widget.deleteLater()
             self.tabs.removeTab(index)
         except Exception as e:
@@ -281,8 +363,14 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         """Handle application close"""
         try:
-            # Auto-save all before closing
-            self._autosave_all()
+            # Auto-save and release every document, then wait for the writes to land
+            for i in range(self.tabs.count()):
+                pane = self.tabs.widget(i)
+                if pane and hasattr(pane, 'viewer'):
+                    pane.viewer.close_document()
+            if self.library_dialog is not None:
+                self.library_dialog.close()
+            SIDECAR_WRITER.flush(timeout=30)
             event.accept()
         except Exception as e:
             print(f"Close error: {e}")
@@ -330,5 +418,8 @@ def main():
         return 1
 
 if __name__ == "__main__":
+    # Parallel export starts worker processes (needed for frozen Windows builds)
+    import multiprocessing
+    multiprocessing.freeze_support()
     exit_code = main()
     sys.exit(exit_code)
\ No newline at end of file
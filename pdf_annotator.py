@@ -1,7 +1,7 @@
 # pdf_annotator.py – PDF Annotation and Tagging System
 # --------------------------------------------------------------------
 
-import sys, io, textwrap
+import sys, io, os, textwrap, time, weakref
 from pathlib import Path
 import fitz       # PyMuPDF
 from fitz import Quad
@@ -14,14 +14,22 @@ try:
 except ImportError:
     OCR_ON = False
 
-from PySide6.QtCore import Qt, QRect, QPoint, QTimer, Signal
+from PySide6.QtCore import Qt, QRect, QPoint, QThread, QTimer, Signal
 from PySide6.QtGui import QPainter, QColor, QPixmap, QImage, QCursor, QPolygon, QPen, QFont
 from PySide6.QtWidgets import (
     QWidget, QHBoxLayout, QVBoxLayout, QSplitter,
     QScrollArea, QLabel, QFileDialog, QMessageBox, QDialog
 )
 
+from annotation_store import HighlightList, SqliteHighlightStore, store_path
 from pdf_core import PdfCore
+from pdf_export import PROFILE_BALANCED, STYLE_DRAWN, ExportCancelled, export_annotated
+from pdf_native import native_records, read_native, save_incremental, sync_native
+from sidecar import (
+    AnnotationJournal, SIDECAR_WRITER, apply_journal, encode_snapshot,
+    journal_next_id, journal_path, load_sidecar, sidecar_is_binary, write_snapshot
+)
+from sidecar_binary import BinarySidecar
 from ui_components import (
     ACCENT, HIGHLIGHT_COLORS, SleekTagPopup, ToastPopup, 
     TagDialog, TagSidebar
@@ -32,13 +40,24 @@ class PdfAnnotator(PdfCore):
     """PDF viewer with annotation and tagging capabilities"""
     
     highlight_created = Signal(dict)
+    highlight_changed = Signal(dict)       # tag (or color) edited in place
+    highlight_removed = Signal(int)        # id
+    highlights_loaded = Signal(object)     # list of highlights added in one batch
+    highlights_reset = Signal()            # store replaced: rebuild from self.highlights
+    dirty_changed = Signal(bool)
+    _save_finished = Signal(str, int, str)   # path, revision (-1: not auto-save), error
     TAB_W, TAB_H = 20, 50
 
+    # PyMuPDF isn't thread-safe: while any tab's export runs on its worker
+    # thread, every tab's native save waits for it
+    _exports_running = 0
+    _native_waiting = weakref.WeakSet()
+
     def __init__(self):
         super().__init__()
         
         # Annotation-specific properties
-        self.highlights = []
+        self.highlights = HighlightList()
         self.current_color = HIGHLIGHT_COLORS["Purple"]
         self.selecting = False
         self.start_point = self.end_point = None
@@ -46,63 +65,318 @@ class PdfAnnotator(PdfCore):
         self.popup = None
         self.current_preset = None
 
+        # Auto-save journal state
+        self._journal_obj = None
+        self._pending_ops = []
+        self._snapshot_stale = False
+        self.sidecar_binary = False     # auto-save sidecar format
+
+        # Binary sidecar still being decoded page by page
+        self._lazy = None
+
+        # Tags mirrored into the PDF as native annotations
+        self.native_mode = False
+        self._native = None     # id -> (page, xref, record json) of our annots
+        self._native_pending = False    # sync deferred while an export runs
+
+        # Export running on a worker thread
+        self._export_worker = None
+        self._export_loading = None
+
+        # Dirty tracking: bumped on every change, synced on every save
+        self.revision = 0
+        self.saved_revision = 0
+        self._queued_revision = None
+        self._save_finished.connect(self._on_save_finished)
+
     # -------- file ops override --------
     def load(self, p: str):
+        self._native = None
+        if self._load_pdf(p):
+            self._pending_ops.clear()
+            self._snapshot_stale = False
+            self._mark_saved()
+            self._native = read_native(self.doc)
+            self.native_mode = bool(self._native)
+            if self._open_store():
+                # An SQLite store supersedes the sidecar snapshot and journal
+                self.highlights_reset.emit()
+            else:
+                self.highlights_reset.emit()
+                self._auto_load()
+                if not self.highlights and self._native:
+                    # No sidecar yet: pick the tags up from the PDF itself
+                    self.highlights.add_many([self._from_record(rec)
+                                              for rec in native_records(self._native)])
+                    self._snapshot_stale = True
+                    self.highlights_reset.emit()
+            if self._native:
+                self._render()
+            return True
+        return False
+
+    def _load_pdf(self, p):
+        """PdfCore.load with the old document's lazy reader set aside: the
+        first render would otherwise decode an old page into the old store"""
+        lazy, self._lazy = self._lazy, None
         if super().load(p):
-            self.highlights.clear()
-            self._auto_load()
+            if lazy:
+                lazy["reader"].close()
             return True
+        if lazy:
+            # Still showing the old document: resume decoding it
+            self._lazy = lazy
+            QTimer.singleShot(0, self._load_more_pages)
         return False
 
+    def _open_store(self):
+        """Close the highlight store and open the current document's: its SQLite
+        store if it has one, else an empty list.  Returns True for SQLite."""
+        self.highlights.close()
+        db = store_path(self._sidecar_path())
+        self.highlights = self._sqlite_store(db) if db.exists() else HighlightList()
+        return self.highlights.durable
+
+    def _sqlite_store(self, db):
+        return SqliteHighlightStore(db, self._record, self._from_record, self.original_path)
+
+    def close_document(self):
+        """Final auto-save, then let go of the store and the lazy reader (the
+        tab is closing): an SQLite store commits and closes its connection,
+        which folds its WAL back in and removes the -wal / -shm files"""
+        self._stop_export()
+        self._auto_save()
+        self._close_lazy()
+        try:
+            self.highlights.close()
+        except Exception as e:
+            print(f"Store close error: {e}")
+        self.highlights = HighlightList()
+
+    def use_sqlite_store(self, enabled=True):
+        """Move this document's highlights into (or back out of) an SQLite store"""
+        if not hasattr(self, 'original_path') or enabled == self.highlights.durable:
+            return
+        self._load_all_pages()
+        db = store_path(self._sidecar_path())
+        if enabled:
+            store = self._sqlite_store(db)
+            store.clear()
+            store.add_many(self.highlights)
+            store.next_id = max(store.next_id, self.highlights.next_id)
+            store.commit()
+            self.highlights = store
+        else:
+            highlights = HighlightList(self.highlights)
+            highlights.next_id = max(highlights.next_id, self.highlights.next_id)
+            data = {"original_pdf": self.original_path, "next_id": highlights.next_id,
+                    "highlights": [self._record(hl) for hl in highlights]}
+            try:
+                write_snapshot(self._sidecar_path(), data, self.sidecar_binary)
+            except Exception as e:
+                QMessageBox.critical(self, "Save Error", f"Failed to save: {e}")
+                return
+            self._journal().reset()
+            self.highlights.close()
+            for suffix in ("", "-wal", "-shm"):
+                Path(str(db) + suffix).unlink(missing_ok=True)
+            self.highlights = highlights
+        self._pending_ops.clear()
+        self._snapshot_stale = False
+        self._mark_saved()
+        self.update()
+
+    def set_native_mode(self, enabled=True):
+        """Mirror this document's tags into the PDF as native annotations (or remove them)"""
+        if not self.doc or enabled == self.native_mode:
+            return
+        self.native_mode = enabled
+        if not self._save_native():
+            self.native_mode = not enabled
+        self._render()
+
+    def _save_native(self):
+        """Sync our PDF annotations with the highlights and append them to the PDF"""
+        if PdfAnnotator._exports_running:
+            # PyMuPDF isn't thread-safe: wait for the exports to finish
+            self._native_pending = True
+            PdfAnnotator._native_waiting.add(self)
+            return True
+        try:
+            self._load_all_pages()
+            records = [self._record(hl) for hl in self.highlights] if self.native_mode else []
+            self._native, changes = sync_native(self.doc, records, self._native)
+            if changes:
+                self.doc = save_incremental(self.doc)
+            return True
+        except Exception as e:
+            self._native = None     # re-read from the PDF next time
+            QMessageBox.critical(self, "Save Error", f"Failed to save tags into the PDF: {e}")
+            return False
+
+    def _show_annots(self):
+        # Our own annots would double the overlay, so pages carrying them render without
+        return not any(page == self.page for page, _, _ in (self._native or {}).values())
+
+    def _sidecar_path(self):
+        return str(Path(self.original_path).with_suffix('.atnolol'))
+
+    def _is_sidecar(self, filepath):
+        """Whether filepath is the auto-save sidecar, however it is spelled
+        (relative, through a symlink, in another case on Windows)"""
+        return (os.path.normcase(os.path.realpath(filepath))
+                == os.path.normcase(os.path.realpath(self._sidecar_path())))
+
+    def _journal(self):
+        """Edit journal of the current document's auto-save sidecar"""
+        path = Path(self._sidecar_path())
+        if self._journal_obj is None or self._journal_obj.sidecar != path:
+            self._journal_obj = AnnotationJournal(path)
+        return self._journal_obj
+
+    def _log(self, op, hl=None, hid=None):
+        """Queue a journal op for the next auto-save"""
+        if not self.highlights.durable:
+            self._pending_ops.append({"op": op, "id": hid} if hl is None
+                                     else {"op": op, "hl": self._record(hl)})
+        self._touch()
+
+    # -------- dirty tracking --------
+    def is_dirty(self):
+        return self.revision != self.saved_revision
+
+    def _touch(self):
+        """Record a change that the auto-save sidecar doesn't have yet"""
+        was_dirty = self.is_dirty()
+        self.revision += 1
+        if not was_dirty:
+            self.dirty_changed.emit(True)
+
+    def _mark_saved(self, revision=None):
+        was_dirty = self.is_dirty()
+        self.saved_revision = self.revision if revision is None else revision
+        if was_dirty != self.is_dirty():
+            self.dirty_changed.emit(self.is_dirty())
+
     def _auto_save(self):
-        """Automatically save annotations alongside PDF"""
-        if hasattr(self, 'original_path'):
-            auto_file = str(Path(self.original_path).with_suffix('.atnolol'))
-            self.save_annotations(auto_file)
+        """Automatically save annotations alongside PDF (no-op when clean)"""
+        if (not hasattr(self, 'original_path') or not self.is_dirty()
+                or self.revision == self._queued_revision):
+            return
+        if self.native_mode:
+            self._save_native()
+        if self.highlights.durable:
+            # SQLite store: the auto-save is committing the open transaction
+            try:
+                self.highlights.commit()
+                self._snapshot_stale = False
+                self._mark_saved()
+            except Exception as e:
+                QMessageBox.critical(self, "Save Error", f"Failed to save: {e}")
+            return
+        if (self._snapshot_stale or self._journal().needs_compaction()
+                or not Path(self._sidecar_path()).exists()):
+            self.save_annotations(self._sidecar_path())
+        else:
+            self._queue_save(self._sidecar_path(), ops=self._pending_ops)
+
+    def _queue_save(self, filepath, snapshot=None, ops=()):
+        """Hand a save to the background sidecar writer"""
+        auto = self._is_sidecar(filepath)
+        revision = self.revision if auto else -1
+        if auto:
+            # Everything up to this revision is now the writer's job
+            self._pending_ops = []
+            self._snapshot_stale = False
+            self._queued_revision = revision
+        SIDECAR_WRITER.submit(
+            filepath, snapshot, ops, self._journal() if auto else None,
+            done=lambda err: self._save_finished.emit(str(filepath), revision, err or ""))
+
+    def _on_save_finished(self, filepath, revision, error):
+        if error:
+            if revision >= 0:
+                # Queued ops are lost, so the next auto-save rewrites the snapshot
+                self._snapshot_stale = True
+                self._queued_revision = None
+            QMessageBox.critical(self, "Save Error", f"Failed to save: {error}")
+        elif revision > self.saved_revision:
+            self._mark_saved(revision)
 
     def _auto_load(self):
         """Automatically load annotations if they exist"""
         if hasattr(self, 'original_path'):
-            auto_file = str(Path(self.original_path).with_suffix('.atnolol'))
-            if Path(auto_file).exists():
+            auto_file = self._sidecar_path()
+            if Path(auto_file).exists() or journal_path(auto_file).exists():
                 self.load_annotations(auto_file)
 
     # -------- annotation file operations --------
-    def save_annotations(self, filepath=None):
-        """Save current annotations to a JSON file"""
+    @staticmethod
+    def _record(hl):
+        """Highlight -> JSON-safe sidecar record"""
+        r = hl["pdf_rect"]
+        return {
+            "page": hl["page"],
+            "pdf_rect": [r.x0, r.y0, r.x1, r.y1],
+            "color": hl["color"].getRgb(),
+            "text": hl["text"],
+            "tag": hl["tag"],
+            "id": hl["id"]
+        }
+
+    _colors = {}    # rgba -> shared QColor, sidecars only use a handful
+
+    @classmethod
+    def _from_record(cls, rec):
+        """Sidecar record -> highlight"""
+        rgba = tuple(rec["color"])
+        color = cls._colors.get(rgba)
+        if color is None:
+            color = cls._colors[rgba] = QColor(*rgba)
+        return dict(
+            page=rec["page"],
+            pdf_rect=fitz.Rect(rec["pdf_rect"]),
+            color=color,
+            text=rec["text"],
+            tag=rec["tag"],
+            id=rec["id"]
+        )
+
+    SAVE_FILTERS = "atnoLOL Files (*.atnolol);;atnoLOL Compact Binary (*.atnolol);;JSON Files (*.json)"
+
+    def save_annotations(self, filepath=None, binary=None):
+        """Save current annotations to a JSON (or compact binary) file"""
         if not filepath:
-            filepath, _ = QFileDialog.getSaveFileName(
+            filters = self.SAVE_FILTERS.split(";;")
+            filepath, chosen = QFileDialog.getSaveFileName(
                 self, "Save Annotations", 
-                str(Path(self.original_path).with_suffix('.atnolol')),
-                "atnoLOL Files (*.atnolol);;JSON Files (*.json)")
+                self._sidecar_path(),
+                self.SAVE_FILTERS, filters[1] if self.sidecar_binary else filters[0])
+            binary = "Binary" in chosen
         if not filepath: 
             return False
+
+        if binary is None:
+            binary = self.sidecar_binary
+        if self._is_sidecar(filepath):
+            # The auto-save sidecar: written under its own name, so the job
+            # merges with queued auto-saves and the snapshot resets the journal
+            self.sidecar_binary = binary
+            filepath = self._sidecar_path()
         
-        import json
-        data = {
-            "original_pdf": self.original_path,
-            "highlights": []
-        }
-        
-        for hl in self.highlights:
-            hl_data = {
-                "page": hl["page"],
-                "pdf_rect": [hl["pdf_rect"].x0, hl["pdf_rect"].y0, 
-                           hl["pdf_rect"].x1, hl["pdf_rect"].y1],
-                "color": hl["color"].getRgb(),
-                "text": hl["text"],
-                "tag": hl["tag"],
-                "id": hl["id"]
-            }
-            data["highlights"].append(hl_data)
-        
-        try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            return True
-        except Exception as e:
-            QMessageBox.critical(self, "Save Error", f"Failed to save: {e}")
-            return False
+        self._queue_save(filepath, snapshot=self._snapshot(binary))
+        return True
+
+    def _snapshot(self, binary=False):
+        """Cheap copy of the highlights; records are encoded on the writer thread"""
+        self._load_all_pages()
+        rows = [dict(hl) for hl in self.highlights]
+        pdf, next_id = self.original_path, self.highlights.next_id
+        return lambda: encode_snapshot({
+            "original_pdf": pdf,
+            "next_id": next_id,
+            "highlights": [self._record(hl) for hl in rows]
+        }, binary)
 
     def load_annotations(self, filepath=None):
         """Load annotations from a JSON file"""
@@ -113,44 +387,131 @@ class PdfAnnotator(PdfCore):
         if not filepath: 
             return False
         
-        import json
+        reader = None
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            # Binary sidecars are decoded lazily, JSON ones in full
+            if sidecar_is_binary(filepath):
+                reader = BinarySidecar(filepath)
+                pdf = reader.original_pdf
+            else:
+                data = load_sidecar(filepath)
+                pdf = data["original_pdf"]
             
             # Load the original PDF if different
-            if data["original_pdf"] != getattr(self, 'original_path', ''):
-                if not super().load(data["original_pdf"]):
+            if pdf and pdf != getattr(self, 'original_path', ''):
+                self._native = None
+                if not self._load_pdf(pdf):
                     QMessageBox.warning(self, "PDF not found", 
-                                      f"Original PDF not found: {data['original_pdf']}")
+                                      f"Original PDF not found: {pdf}")
+                    if reader:
+                        reader.close()
                     return False
+                # The old document's store must not receive this one's tags
+                self._open_store()
+                self._native = read_native(self.doc)
+                self.native_mode = bool(self._native)
+                if self._native:
+                    self._render()
             
             # Clear existing highlights
+            self._close_lazy()
             self.highlights.clear()
+            self._pending_ops.clear()
+            self._snapshot_stale = False
             
-            # Load highlights
-            for hl_data in data["highlights"]:
-                rect = fitz.Rect(hl_data["pdf_rect"])
-                color = QColor(*hl_data["color"])
-                
-                hl = dict(
-                    page=hl_data["page"],
-                    pdf_rect=rect,
-                    color=color,
-                    text=hl_data["text"],
-                    tag=hl_data["tag"],
-                    id=hl_data["id"]
-                )
-                self.highlights.append(hl)
-                self.highlight_created.emit(hl)
+            # Load highlights in one batch
+            renumbered = 0
+            if reader:
+                journal = AnnotationJournal(filepath).fold()
+                self.highlights.next_id = journal_next_id(reader.next_id, *journal)
+            else:
+                self.highlights.next_id = data["next_id"]
+            if not reader:
+                renumbered = self.highlights.add_many([self._from_record(rec)
+                                                       for rec in data["highlights"]])
+            self.highlights_reset.emit()
+            if reader:
+                self._start_lazy(reader, journal)
+                if self.highlights.durable:
+                    # Decode now so the commit below covers every page
+                    self._load_all_pages()
+
+            if Path(filepath) == Path(self._sidecar_path()):
+                self.sidecar_binary = reader is not None
+
+            # Annotations from elsewhere (or with duplicate ids renumbered)
+            # must reach the auto-save sidecar in full
+            if Path(filepath) != Path(self._sidecar_path()) or renumbered:
+                self._snapshot_stale = True
+            if self._snapshot_stale:
+                self._touch()
+            else:
+                if self.highlights.durable:
+                    self.highlights.commit()
+                self._mark_saved()
             
             self.update()
             return True
             
         except Exception as e:
+            if reader and self._lazy is None:
+                reader.close()
             QMessageBox.critical(self, "Load Error", f"Failed to load: {e}")
             return False
 
+    # -------- lazy binary sidecar loading --------
+    def _start_lazy(self, reader, journal_state):
+        """Decode the current page now, the other pages in the background"""
+        upserts, deletes = journal_state
+        by_page = {}
+        for hid, rec in upserts.items():
+            by_page.setdefault(rec["page"], {})[hid] = rec
+        self._lazy = dict(reader=reader, upserts=by_page, deletes=deletes,
+                          pages=set(reader.pages()) | set(by_page))
+        self._load_page(self.page)
+        QTimer.singleShot(0, self._load_more_pages)
+
+    def _load_page(self, page):
+        lazy = self._lazy
+        if not lazy or page not in lazy["pages"]:
+            return
+        lazy["pages"].discard(page)
+        records = apply_journal(lazy["reader"].read_page(page),
+                                lazy["upserts"].pop(page, {}), lazy["deletes"])
+        hls = [self._from_record(rec) for rec in records]
+        if self.highlights.add_many(hls):
+            # Duplicate ids from an older sidecar were renumbered
+            self._snapshot_stale = True
+            self._touch()
+        self.highlights_loaded.emit(hls)
+        if not lazy["pages"]:
+            self._close_lazy()
+
+    def _load_more_pages(self):
+        """Decode pages nearest the current one in ~15 ms slices"""
+        deadline = time.perf_counter() + 0.015
+        while self._lazy and time.perf_counter() < deadline:
+            self._load_page(min(self._lazy["pages"], key=lambda p: abs(p - self.page)))
+        if self._lazy:
+            QTimer.singleShot(0, self._load_more_pages)
+
+    def _load_all_pages(self):
+        while self._lazy:
+            self._load_page(next(iter(self._lazy["pages"])))
+
+    def _close_lazy(self):
+        if self._lazy:
+            self._lazy["reader"].close()
+            self._lazy = None
+
+    def _render(self):
+        self._load_page(self.page)
+        super()._render()
+
+    def _render_preview(self):
+        self._load_page(self.page)
+        super()._render_preview()
+
     # -------- text selection helpers --------
     def _snap_to_text(self, selection_rect):
         """Better text recognition - snap to actual text like normal text selection"""
@@ -254,9 +615,9 @@ class PdfAnnotator(PdfCore):
         qp.setRenderHint(QPainter.Antialiasing)
 
         # Draw highlights
-        for hl in self.highlights:
-            if hl["page"] == self.page:
-                qp.fillRect(self._pdf_to_widget(hl["pdf_rect"]), hl["color"])
+        page_highlights = self.highlights.on_page(self.page)
+        for hl in page_highlights:
+            qp.fillRect(self._pdf_to_widget(hl["pdf_rect"]), hl["color"])
 
         # Draw current selection
         if self.selecting and self.start_point:
@@ -267,8 +628,8 @@ class PdfAnnotator(PdfCore):
 
         # Draw tabs
         self.tab_rects.clear()
-        for hl in self.highlights:
-            if hl["page"] != self.page or not hl["tag"].get("printable", True): 
+        for hl in page_highlights:
+            if not hl["tag"].get("printable", True): 
                 continue
             wr = self._pdf_to_widget(hl["pdf_rect"])
             ty = max(self.render_rect.top(),
@@ -373,10 +734,11 @@ class PdfAnnotator(PdfCore):
                     color=highlight_color,
                     text=selected_text,
                     tag=tag_data,
-                    id=len(self.highlights)
+                    id=self.highlights.new_id()
                 )
                 
                 self.highlights.append(hl)
+                self._log("add", hl)
                 self.highlight_created.emit(hl)
                 self.update()
                 self._auto_save()
@@ -418,10 +780,11 @@ class PdfAnnotator(PdfCore):
             color=highlight_color,
             text="Manual highlight",
             tag=tag_data,
-            id=len(self.highlights)
+            id=self.highlights.new_id()
         )
         
         self.highlights.append(hl)
+        self._log("add", hl)
         self.highlight_created.emit(hl)
         self.update()
         self._auto_save()
@@ -460,173 +823,179 @@ class PdfAnnotator(PdfCore):
         self.current_preset = None
         
     def remove_highlight(self, hid):
-        self.highlights = [h for h in self.highlights if h["id"] != hid]
+        self.highlights.remove_id(hid)
+        self._log("del", hid=hid)
+        self.highlight_removed.emit(hid)
+        self.update()
+        self._auto_save()
+
+    def update_highlight(self, hid, tag):
+        """Replace a highlight's tag data (and color, if the tag names one)"""
+        hl = self.highlights.get(hid)
+        if hl:
+            hl["tag"] = tag
+            if tag.get("color") in HIGHLIGHT_COLORS:
+                hl["color"] = HIGHLIGHT_COLORS[tag["color"]]
+            self.highlights.replace(hl)
+            self._log("edit", hl)
+            self.highlight_changed.emit(hl)
         self.update()
         self._auto_save()
+        return hl
 
     # -------- export PDF (ALWAYS HIGH QUALITY WITH ANNOTATIONS) --------
     def export_pdf(self):
-        """Export PDF with high-quality highlights and annotations"""
-        if not self.doc: 
+        """Export PDF with high-quality highlights and annotations (on a worker thread)"""
+        if not self.doc or self._export_worker is not None:
             return
-        
-        # Show loading screen
-        from loading_screen import ExportLoadingScreen
-        loading = ExportLoadingScreen(self)
-        loading.start_loading(2000)  # 2 second loading
-        
-        loading.update_message("Choosing export location...")
-        
+        self._load_all_pages()
+
+        from export_dialog import ExportOptionsDialog
+        dlg = ExportOptionsDialog(self)
+        if dlg.exec() != QDialog.Accepted:
+            return
+        options = dlg.get_export_options()
+
         fn, _ = QFileDialog.getSaveFileName(self, "Export PDF 🌸",
                                             str(Path.home() / "Annotated_PDF.pdf"),
                                             "PDF Files (*.pdf)")
         if not fn: 
-            loading.close()
             return
 
-        loading.update_message("Creating beautiful PDF with annotations...")
+        # The worker gets plain records and opens its own copy of the document
+        src = getattr(self.doc, 'name', None)
+        if not (src and Path(src).exists()):
+            # Handle in-memory documents safely
+            src = self.doc.write()
+        records = [self._record(hl) for hl in self.highlights]
 
+        from loading_screen import ExportLoadingScreen
+        loading = self._export_loading = ExportLoadingScreen(self)
+        worker = self._export_worker = ExportWorker(src, records, fn, options, self)
+        worker.progress.connect(loading.set_progress)
+        worker.saving.connect(lambda: loading.set_busy("Saving your beautiful annotated PDF..."))
+        worker.result.connect(self._on_export_finished)
+        loading.cancel_requested.connect(worker.cancel)
+        loading.start_loading()
+        PdfAnnotator._exports_running += 1
+        worker.start()
+
+    def export_report(self):
+        """Write this document's tags as a CSV / JSONL / Markdown report"""
+        if not self.doc:
+            return
+        from report_export import FILTERS, FORMATS, record_rows, write_report
+        fn, chosen = QFileDialog.getSaveFileName(self, "Export Tag Report 🌸",
+                                                 str(Path(self.original_path).with_suffix(".csv")),
+                                                 FILTERS)
+        if not fn:
+            return
+        if Path(fn).suffix.lower() not in FORMATS:
+            fn += chosen[chosen.index("*") + 1:-1]     # "CSV (*.csv)" -> ".csv"
+        self._load_all_pages()
         try:
-            # Memory-safe document creation
-            src = getattr(self.doc, 'name', None)
-            if src and Path(src).exists():
-                new_doc = fitz.open(src)
-            else:
-                # Handle in-memory documents safely
-                doc_bytes = self.doc.write()
-                new_doc = fitz.open(stream=doc_bytes, filetype="pdf")
-            
-            loading.update_message("Adding your highlights and annotations...")
-            
-            # Process highlights with memory management - ALWAYS HIGH QUALITY WITH ANNOTATIONS
-            for i, hl in enumerate(self.highlights):
-                try:
-                    pg = new_doc[hl["page"]]
-                    rect = fitz.Rect(hl["pdf_rect"])
-                    col = hl["color"]
-                    r, g, b, a = [c / 255.0 for c in col.getRgb()]
-
-                    # Always draw high-quality highlight
-                    pg.draw_rect(rect, color=None,
-                                 fill=(r, g, b),
-                                 fill_opacity=0.4,  # Slightly more visible
-                                 overlay=True)
-                    
-                    # Draw highlight border for better visibility
-                    pg.draw_rect(rect, color=(r * 0.7, g * 0.7, b * 0.7),
-                                 fill=None, width=1.5, overlay=True)
-
-                    # ALWAYS add annotations for printable tags
-                    if hl["tag"].get("printable", True):
-                        # Draw colored tab in left margin
-                        tab_height = min(40, max(20, rect.height))
-                        tab_x = max(10, rect.x0 - 15)  # Position tab to the left
-                        tab = fitz.Rect(tab_x - 12, rect.y0, tab_x - 2, rect.y0 + tab_height)
-                        
-                        # Draw tab with stronger colors
-                        pg.draw_rect(tab, color=(r * 0.8, g * 0.8, b * 0.8),
-                                     fill=(r, g, b), fill_opacity=1.0, 
-                                     width=1.5, overlay=True)
-                        
-                        # Add annotation bubble
-                        try:
-                            title = str(hl['tag'].get('title', 'Tagged'))
-                            desc = str(hl['tag'].get('desc', ''))
-                            
-                            # Create annotation text
-                            if title and desc:
-                                bubble_text = f"{title}: {desc}"
-                            elif title:
-                                bubble_text = title
-                            elif desc:
-                                bubble_text = desc
-                            else:
-                                bubble_text = "Tagged"
-                            
-                            # Clean text for PDF compatibility
-                            import re
-                            bubble_text = re.sub(r'[^\w\s\-\.,!?\'"()]', '', bubble_text)
-                            if len(bubble_text) > 80:
-                                bubble_text = bubble_text[:77] + "..."
-                            
-                            if not bubble_text.strip():
-                                bubble_text = "Tagged"
-                            
-                            # Position bubble in right margin or bottom
-                            page_height = pg.rect.height
-                            page_width = pg.rect.width
-                            
-                            # Try right margin first
-                            bubble_x = min(page_width - 200, rect.x1 + 10)
-                            bubble_y = rect.y0
-                            bubble_w = min(180, page_width - bubble_x - 10)
-                            bubble_h = 25
-                            
-                            # If it would go off page, put in bottom margin
-                            if bubble_x + bubble_w > page_width - 10:
-                                bubble_x = max(20, rect.x0)
-                                bubble_y = page_height - 35
-                                bubble_w = min(200, page_width - bubble_x - 20)
-                            
-                            bubble_rect = fitz.Rect(bubble_x, bubble_y,
-                                                  bubble_x + bubble_w, bubble_y + bubble_h)
-                            
-                            # Draw bubble background with border
-                            pg.draw_rect(bubble_rect, color=(0.3, 0.3, 0.3),
-                                        fill=(0.95, 0.95, 0.95), fill_opacity=0.9,
-                                        width=1, overlay=True)
-                            
-                            # Insert text in bubble
-                            text_rect = fitz.Rect(bubble_rect.x0 + 4, bubble_rect.y0 + 3, 
-                                                bubble_rect.x1 - 4, bubble_rect.y1 - 3)
-                            pg.insert_textbox(text_rect,
-                                              bubble_text,
-                                              fontsize=8, fontname="helv",
-                                              color=(0.1, 0.1, 0.1), align=0)
-                            
-                            # Draw connector line from highlight to bubble
-                            if bubble_y != page_height - 35:  # Only if not in bottom margin
-                                line_start = fitz.Point(rect.x1, rect.y0 + rect.height/2)
-                                line_end = fitz.Point(bubble_x, bubble_y + bubble_h/2)
-                                pg.draw_line(line_start, line_end, color=(0.5, 0.5, 0.5), width=1)
-                        
-                        except Exception as e:
-                            print(f"Error creating annotation bubble: {e}")
-                            # Continue without bubble if there's an error
-                            pass
-                        
-                except Exception as e:
-                    print(f"Error processing highlight {i}: {e}")
-                    continue  # Skip problematic highlights
-
-            loading.update_message("Saving your beautiful annotated PDF...")
-
-            # Save with high quality settings
-            try:
-                new_doc.save(fn, garbage=4, deflate=True, clean=True)
-            except Exception:
-                # Fallback save
-                new_doc.save(fn)
-            finally:
-                new_doc.close()
-                new_doc = None
-            
-            loading.close()
-            
+            n = write_report(record_rows(Path(self.original_path).name,
+                                         (self._record(hl) for hl in self.highlights)), fn)
+        except Exception as e:
+            QMessageBox.critical(self, "Report Error 😔", f"Couldn't write the report: {e}")
+            return
+        self._show_toast(f"Report saved: {n} tags 🌸")
+
+    def _end_export(self):
+        """Join the export worker and drop it, returns its stats; the last
+        export to end runs the native saves held back meanwhile"""
+        self._export_loading.close()
+        self._export_worker.wait()
+        stats = self._export_worker.stats
+        self._export_loading = self._export_worker = None
+        PdfAnnotator._exports_running -= 1
+        if not PdfAnnotator._exports_running:
+            waiting = list(PdfAnnotator._native_waiting)
+            PdfAnnotator._native_waiting.clear()
+            for viewer in waiting:
+                if viewer._native_pending:
+                    viewer._native_pending = False
+                    viewer._save_native()
+        return stats
+
+    def _stop_export(self):
+        """Cancel a running export and wait for it: the worker is a child of
+        this viewer, and destroying a running QThread aborts the process"""
+        if self._export_worker is None:
+            return
+        self._export_worker.result.disconnect(self._on_export_finished)
+        self._export_worker.cancel()
+        self._end_export()
+
+    def _on_export_finished(self, status, detail):
+        if self._export_worker is None:
+            return      # stopped by _stop_export, result already queued
+        stats = self._end_export()
+
+        if status == "done":
             # Success message
             QMessageBox.information(self, "Export Complete! 🌸✨", 
                                   f"Your PDF has been exported with high-quality highlights and annotations!\n"
-                                  f"🌺 Saved as: {Path(fn).name}\n\n"
+                                  f"🌺 Saved as: {Path(detail).name}\n"
+                                  f"⏱️ {self._export_summary(stats)}\n\n"
                                   f"✨ Includes: Colored highlights, tabs, and annotation bubbles")
-        except Exception as e:
-            loading.close()
+        elif status == "cancelled":
+            self._show_toast("Export cancelled")
+        else:
             QMessageBox.critical(self, "Export Error 😔", 
-                                f"Sorry! Export failed: {str(e)}\n\n"
+                                f"Sorry! Export failed: {detail}\n\n"
                                 f"💡 Try:\n"
                                 f"• Closing other programs\n"
                                 f"• Saving to Desktop\n"
                                 f"• Using a shorter filename")
 
+    @staticmethod
+    def _export_summary(stats):
+        mode = "changed pages only" if stats["incremental"] else f"{stats['profile']} profile"
+        size = stats["bytes"]
+        size = f"{size / 1048576:.1f} MB" if size >= 1048576 else f"{size / 1024:.0f} KB"
+        return f"{stats['seconds']:.1f}s, {size} ({mode})"
+
+
+# ───────────────────────── Export Worker ─────────────────────────
+class ExportWorker(QThread):
+    """Runs pdf_export.export_annotated off the GUI thread"""
+
+    progress = Signal(int, int)     # annotated pages done, total
+    saving = Signal()
+    result = Signal(str, str)       # "done" / "cancelled" / "failed", output path or error
+
+    def __init__(self, src, records, out, options, parent=None):
+        super().__init__(parent)
+        self.src, self.records, self.out = src, records, out
+        self.options = options
+        self.stats = None
+        self._cancel = False
+
+    def cancel(self):
+        self._cancel = True
+
+    def _progress(self, done, total):
+        self.progress.emit(done, total)
+        if done == total:
+            self.saving.emit()
+
+    def run(self):
+        try:
+            self.stats = export_annotated(
+                self.src, self.records, self.out, progress=self._progress,
+                cancelled=lambda: self._cancel, workers=None,
+                style=self.options.get('style', STYLE_DRAWN),
+                tags=self.options.get('include_annotations', True),
+                profile=self.options.get('profile', PROFILE_BALANCED),
+                downsample=self.options.get('downsample'))
+        except ExportCancelled:
+            self.result.emit("cancelled", "")
+        except Exception as e:
+            self.result.emit("failed", str(e))
+        else:
+            self.result.emit("done", self.out)
+
 
 class PDFPane(QWidget):
     """Main PDF pane widget that combines annotator with sidebar"""
@@ -657,6 +1026,9 @@ class PDFPane(QWidget):
     def export(self): 
         self.viewer.export_pdf()
         
+    def export_report(self):
+        self.viewer.export_report()
+
     def save_annotations(self): 
         return self.viewer.save_annotations()
         
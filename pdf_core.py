@@ -1,18 +1,27 @@
 # pdf_core.py – Core PDF Display and Navigation
 # --------------------------------------------------------------------
+# The page is rendered at self.zoom and fitted into the widget.  Up to
+# DEFAULT_ZOOM it fits the view; past it the widget grows by
+# zoom / DEFAULT_ZOOM and the surrounding QScrollArea scrolls.
+#
+# jump_to_rect() centres a highlight in the view and pulses it.  When
+# that lands on another page the render is progressive: a coarse page
+# (PREVIEW_ZOOM) plus the part that ends up in view at screen
+# resolution are painted at once, the full page at self.zoom follows
+# once the pulse is over.
 
-import sys, io
+import sys, io, time
 from pathlib import Path
 import fitz       # PyMuPDF
 
 from PySide6.QtCore import (
-    Qt, QRect, QPoint, QTimer
+    Qt, QEvent, QRect, QPoint, QTimer
 )
 from PySide6.QtGui import (
-    QPainter, QColor, QPixmap, QImage, QCursor
+    QPainter, QColor, QPen, QPixmap, QImage, QCursor
 )
 from PySide6.QtWidgets import (
-    QWidget, QLabel, QFileDialog, QMessageBox
+    QApplication, QWidget, QLabel, QFileDialog, QMessageBox, QScrollArea
 )
 
 from ui_components import ACCENT
@@ -20,18 +29,32 @@ from ui_components import ACCENT
 # ───────────────────────── Core PDF Display ─────────────────────────
 class PdfCore(QLabel):
     """Core PDF display without tagging - handles zoom, navigation, rendering"""
+
+    DEFAULT_ZOOM = 2.8
+    MIN_SIZE = (600, 800)
+    PAGE_MARGIN = 40        # px left free beside a magnified page (tag tabs)
+    PREVIEW_ZOOM = 0.5      # coarse first pass of a progressive render
+    PULSE_MS = 900
     
     def __init__(self):
         super().__init__()
         self.setAlignment(Qt.AlignCenter)
         self.setStyleSheet(f"background:#1a1a1a;border:2px solid {ACCENT};border-radius:8px")
-        self.setMinimumSize(600, 800); self.setMouseTracking(True)
+        self.setMinimumSize(*self.MIN_SIZE); self.setMouseTracking(True)
 
-        self.doc = None; self.page = 0; self.zoom = 2.8; self.pix = None
+        self.doc = None; self.page = 0; self.zoom = self.DEFAULT_ZOOM; self.pix = None
+        self.page_rect = None   # current page's rect, cached by _render
         self.render_rect = QRect()
         self.text_blocks = []
         self.hover_timer = QTimer(singleShot=True, interval=50, timeout=self._hover)
 
+        # Progressive render: sharp part of the page in view (clip, pixmap)
+        # over a coarse pix until the full render replaces both
+        self._patch = None
+        self._render_timer = QTimer(self, singleShot=True, timeout=self._render)
+        self._pulse = None      # (pdf rect, start time)
+        self._pulse_timer = QTimer(self, interval=30, timeout=self._pulse_step)
+
     # -------- file ops --------
     def load(self, p: str):
         try:
@@ -46,13 +69,45 @@ class PdfCore(QLabel):
 
     def _render(self):
         if not self.doc: return
+        self._render_timer.stop()
         pg = self.doc[self.page]
-        pm = pg.get_pixmap(matrix=fitz.Matrix(self.zoom, self.zoom), alpha=False)
-        self.pix = QPixmap.fromImage(QImage(pm.samples, pm.width, pm.height,
-                                            pm.stride, QImage.Format_RGB888))
+        self.page_rect = pg.rect
+        self.pix = self._pixmap(pg, self.zoom)
+        self._patch = None
         self._cache_blocks()
+        self._fit_extent()
         self.update()
 
+    def _pixmap(self, pg, zoom, clip=None):
+        pm = pg.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False,
+                           annots=self._show_annots())
+        return QPixmap.fromImage(QImage(pm.samples, pm.width, pm.height,
+                                        pm.stride, QImage.Format_RGB888))
+
+    def _render_preview(self):
+        """First pass of a progressive render: the whole page, coarse"""
+        pg = self.doc[self.page]
+        self.page_rect = pg.rect
+        self.pix = self._pixmap(pg, self.PREVIEW_ZOOM)
+        self._patch = None
+        self.text_blocks.clear()
+
+    def _render_patch(self, visible):
+        """Second pass: the page inside visible (widget coords) at screen resolution"""
+        rr, pg = self.render_rect, self.page_rect
+        area = visible & rr
+        if area.isEmpty():
+            return
+        sx, sy = pg.width / rr.width(), pg.height / rr.height()
+        clip = fitz.Rect((area.left() - rr.left()) * sx, (area.top() - rr.top()) * sy,
+                         (area.right() + 1 - rr.left()) * sx, (area.bottom() + 1 - rr.top()) * sy)
+        zoom = min(self.zoom, rr.width() / pg.width * self.devicePixelRatioF())
+        self._patch = (clip, self._pixmap(self.doc[self.page], zoom, clip))
+
+    def _show_annots(self):
+        """Whether the page's own PDF annotations are rendered into the pixmap"""
+        return True
+
     def _cache_blocks(self):
         """Cache text blocks for text detection overlay"""
         self.text_blocks.clear()
@@ -69,32 +124,79 @@ class PdfCore(QLabel):
         if not self.render_rect.contains(pt): return None
         relx = (pt.x() - self.render_rect.left()) / self.render_rect.width()
         rely = (pt.y() - self.render_rect.top())  / self.render_rect.height()
-        pg = self.doc[self.page].rect
+        pg = self.page_rect
         return fitz.Point(relx * pg.width, rely * pg.height)
 
     def _pdf_to_widget(self, r):
         if not self.doc: return QRect()
-        pg = self.doc[self.page].rect
+        pg = self.page_rect
         x = r.x0 / pg.width  * self.render_rect.width()  + self.render_rect.left()
         y = r.y0 / pg.height * self.render_rect.height() + self.render_rect.top()
         w = r.width  / pg.width  * self.render_rect.width()
         h = r.height / pg.height * self.render_rect.height()
         return QRect(int(x), int(y), int(w), int(h))
 
+    # -------- display size --------
+    def _scroll_area(self):
+        """The QScrollArea showing this viewer, if any"""
+        vp = self.parentWidget()
+        sa = vp.parentWidget() if vp is not None else None
+        return sa if isinstance(sa, QScrollArea) else None
+
+    def _fit_extent(self):
+        """Minimum size for the zoom: past DEFAULT_ZOOM the page outgrows the view"""
+        sa = self._scroll_area()
+        mag = self.zoom / self.DEFAULT_ZOOM
+        if sa is None or self.page_rect is None or mag <= 1:
+            self.setMinimumSize(*self.MIN_SIZE)
+            return
+        vp, pg = sa.viewport().size(), self.page_rect
+        sc = min(vp.width() / pg.width, vp.height() / pg.height) * mag
+        self.setMinimumSize(int(pg.width * sc) + 2 * self.PAGE_MARGIN, int(pg.height * sc))
+
+    def _layout(self):
+        """Place the page in the widget (render_rect): fitted, centred"""
+        ws, pg = self.size(), self.page_rect
+        sc = min(ws.width() / pg.width, ws.height() / pg.height)
+        w, h = int(pg.width * sc), int(pg.height * sc)
+        self.render_rect = QRect((ws.width() - w) // 2, (ws.height() - h) // 2, w, h)
+
     # -------- painting --------
     def paintEvent(self, _):
         if not self.pix: return super().paintEvent(_)
         qp = QPainter(self); qp.setRenderHint(QPainter.Antialiasing)
-        ws, ps = self.size(), self.pix.size()
-        sc = min(ws.width() / ps.width(), ws.height() / ps.height())
-        w, h = int(ps.width() * sc), int(ps.height() * sc)
-        x0, y0 = (ws.width() - w) // 2, (ws.height() - h) // 2
-        self.render_rect = QRect(x0, y0, w, h)
+        self._layout()
         qp.drawPixmap(self.render_rect, self.pix)
+        if self._patch:
+            clip, patch = self._patch
+            qp.drawPixmap(self._pdf_to_widget(clip), patch)
 
         # Draw text detection overlay if enabled
         if hasattr(self, 'show_text_detection') and self.show_text_detection:
             self._draw_text_overlay(qp)
+        self._draw_pulse(qp)
+
+    def _draw_pulse(self, qp):
+        """Two expanding, fading rings around the highlight jumped to"""
+        if not self._pulse:
+            return
+        rect, start = self._pulse
+        t = (time.perf_counter() - start) * 1000 / self.PULSE_MS
+        if t >= 1:
+            return
+        grow = int(4 + 12 * (t * 2 % 1))
+        col = QColor(ACCENT)
+        col.setAlpha(int(255 * (1 - t)))
+        qp.setPen(QPen(col, 3))
+        qp.setBrush(Qt.NoBrush)
+        qp.drawRoundedRect(self._pdf_to_widget(rect).adjusted(-grow, -grow, grow, grow), 6, 6)
+
+    def _pulse_step(self):
+        rect, start = self._pulse
+        if (time.perf_counter() - start) * 1000 >= self.PULSE_MS:
+            self._pulse = None
+            self._pulse_timer.stop()
+        self.update(self._pdf_to_widget(rect).adjusted(-20, -20, 20, 20))
 
     def _draw_text_overlay(self, painter):
         """Draw text detection overlay showing detected text blocks (improved)"""
@@ -131,7 +233,7 @@ class PdfCore(QLabel):
         return False
     
     def reset_zoom(self):
-        self.zoom = 2.8
+        self.zoom = self.DEFAULT_ZOOM
         self._render()
     
     def fit_to_width(self):
@@ -148,11 +250,53 @@ class PdfCore(QLabel):
         if self.doc and 0 <= n < len(self.doc):
             self.page = n
             self._render()
-            # Update main window page display
-            if self.parent() and hasattr(self.parent().parent(), '_update_page_display'):
-                self.parent().parent()._update_page_display()
+            sa = self._scroll_area()
+            if sa:
+                sa.verticalScrollBar().setValue(0)
+            self._page_shown()
     jump_to_page = goto
 
+    def _page_shown(self):
+        # Update main window page display
+        if self.parent() and hasattr(self.parent().parent(), '_update_page_display'):
+            self.parent().parent()._update_page_display()
+
+    def jump_to_rect(self, n, rect, pulse=True):
+        """Go to page n with rect (PDF points) centred in the view, pulsing it.
+
+        A jump to another page paints the coarse page and the part in view
+        at once (progressive render), the full render runs after the pulse.
+        """
+        if not self.doc or not 0 <= n < len(self.doc):
+            return
+        rect = fitz.Rect(rect)
+        progressive = n != self.page or self.pix is None
+        self.page = n
+        if progressive:
+            self._render_preview()
+        self._fit_extent()
+        sa = self._scroll_area()
+        if sa:
+            # Let the scroll area size the widget for the new extent now
+            QApplication.sendPostedEvents(None, QEvent.LayoutRequest)
+            self._layout()
+            vp, centre = sa.viewport().size(), self._pdf_to_widget(rect).center()
+            sa.horizontalScrollBar().setValue(centre.x() - vp.width() // 2)
+            sa.verticalScrollBar().setValue(centre.y() - vp.height() // 2)
+            visible = QRect(sa.horizontalScrollBar().value(), sa.verticalScrollBar().value(),
+                            vp.width(), vp.height())
+        else:
+            self._layout()
+            visible = self.rect()
+        if progressive:
+            self._render_patch(visible)
+            self._render_timer.start(self.PULSE_MS if pulse else 0)
+        if pulse:
+            self._pulse = (rect, time.perf_counter())
+            self._pulse_timer.start()
+        self.repaint()
+        self._page_shown()
+
     # -------- wheel event (zoom) --------
     def wheelEvent(self, e):
         if not self.doc: return
@@ -172,8 +316,15 @@ class PdfCore(QLabel):
             else:
                 e.ignore()
         else:
+            # A magnified page scrolls first, then turns at its top / bottom
+            sa = self._scroll_area()
+            bar = sa.verticalScrollBar() if sa else None
+            down = e.angleDelta().y() < 0
+            if bar and bar.maximum() and bar.value() != (bar.maximum() if down else bar.minimum()):
+                e.ignore()
+                return
             # Normal page navigation
-            self.goto(self.page + 1 if e.angleDelta().y() < 0 else self.page - 1)
+            self.goto(self.page + 1 if down else self.page - 1)
             e.accept()
 
     # -------- hover cursor --------
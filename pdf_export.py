@@ -0,0 +1,767 @@
+# pdf_export.py – Annotated PDF Export
+# --------------------------------------------------------------------
+# Bakes highlights (sidecar records) into a copy of the PDF.  Two styles:
+#   "drawn"   filled highlight rects, a colored tab in the margin and a
+#             tag bubble for printable tags, all in the page content
+#   "annots"  native highlight annotations (tag in their popup) plus a
+#             free-text bubble for printable tags: faster to write, and
+#             editable in other PDF viewers.  They carry no sidecar
+#             record, so opening an export never imports its tags, and
+#             highlights of one color share a single appearance stream
+# Qt-free, so PdfAnnotator runs it on a worker thread
+# and reports progress per annotated page; cancelled() is checked
+# between pages and the output file is only replaced once the save
+# went through.
+#
+# Documents with many annotated pages are exported in parallel: the
+# annotated pages are split into contiguous page ranges, each range is
+# copied out and annotated in its own process, and the parts are
+# stitched back together with insert_pdf before the one final save.
+# Stitching keeps the outline and metadata and puts back the source's
+# links and page labels (page numbers don't move).  What insert_pdf
+# can't carry across parts (forms, named destinations, anything under
+# the catalog's /Names) makes such documents take the serial path.
+#
+# Re-exports are incremental: every content stream we draw is marked
+# with a /BlossomTag key, and the catalog of the output remembers the
+# source it came from plus a hash of each page's highlights.  Exporting
+# the same source over that output again only strips and redraws the
+# pages whose hash changed and appends them with an incremental save.
+#
+# Each page's highlights are drawn through one Shape, so a page gets a
+# single new content stream however many highlights it has.  The bubble
+# font and the two opacity states are shared objects: _SharedResources
+# links them into every page's resources before drawing.  Shape finds
+# the font by name instead of adding a copy page by page; the opacity
+# states carry names of our own (_fill draws the see-through fills with
+# them), so no PyMuPDF internals decide whether they are shared.
+#
+# export_to_stream() / export_bytes() are the in-memory variant for
+# services: no files at all, the PDF is written straight into any
+# object with a write() method.  iter_page_pdfs() annotates one page at
+# a time and yields each as its own small PDF, for outputs too large to
+# build in one go.
+#
+# The final save uses one of three profiles (1000 pages, 3000 drawn
+# highlights: save time / size):
+#   fast      no garbage collection or compression      0.1 s   0.85 MB
+#   balanced  drop unused objects, object streams       0.1 s   0.57 MB
+#   smallest  also merge duplicates, recompress images  2.1 s   0.55 MB
+#             and fonts, optionally downsample images
+# clean=True is never used: it merges content streams, which would lose
+# the /BlossomTag marks the incremental re-export relies on.
+
+import hashlib, io, json, os, re, tempfile, time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+import fitz       # PyMuPDF
+
+from bubble_layout import layout_bubbles
+from pdf_native import BT_KEY, strip_native, strip_page
+
+STYLE_DRAWN, STYLE_ANNOTS = "drawn", "annots"
+HIGHLIGHT_OPACITY, BUBBLE_OPACITY = 0.4, 0.9
+BUBBLE_FONT = "helv"
+
+
+PARALLEL_MIN_PAGES = 48     # annotated pages before a process pool pays off
+CHUNKS_PER_WORKER = 4       # smaller ranges -> finer progress, better balance
+
+EXPORT_KEY = "BlossomTagExport"     # catalog key holding the last export's page hashes
+DRAW_VERSION = 5                    # bump when draw_highlight / annotate_highlight output changes
+
+PROFILE_FAST, PROFILE_BALANCED, PROFILE_SMALLEST = "fast", "balanced", "smallest"
+PROFILES = {
+    PROFILE_FAST: dict(garbage=0),
+    PROFILE_BALANCED: dict(garbage=1, deflate=True, use_objstms=1),
+    PROFILE_SMALLEST: dict(garbage=4, deflate=True, deflate_images=True,
+                           deflate_fonts=True, use_objstms=1),
+}
+DOWNSAMPLE_DPI = 150                # default target for downsampled images
+
+
+class ExportCancelled(Exception):
+    """Raised when the cancelled() callback asked the export to stop"""
+
+
+def _bubble_text(tag):
+    title = str(tag.get('title', 'Tagged'))
+    desc = str(tag.get('desc', ''))
+
+    # Create annotation text
+    if title and desc:
+        text = f"{title}: {desc}"
+    elif title:
+        text = title
+    elif desc:
+        text = desc
+    else:
+        text = "Tagged"
+
+    # Clean text for PDF compatibility
+    text = re.sub(r'[^\w\s\-\.,!?\'"()]', '', text)
+    if len(text) > 80:
+        text = text[:77] + "..."
+    return text if text.strip() else "Tagged"
+
+
+def _body(pg, anchors):
+    """The page's content box (what its margins are measured from), highlights
+    included; backgrounds covering nearly the whole page don't count"""
+    page = pg.rect
+    body = fitz.Rect()
+    for _, bbox in pg.get_bboxlog():
+        r = fitz.Rect(bbox) & page
+        if r.width < 0.9 * page.width or r.height < 0.9 * page.height:
+            body |= r
+    for rect in anchors:
+        body |= rect
+    return tuple(body)
+
+
+def _bubbles(pg, recs, tags):
+    """Tag bubble rects of a page's printable highlights, laid out together: {index: rect}"""
+    if not tags:
+        return {}
+    printable = [i for i, rec in enumerate(recs) if rec["tag"].get("printable", True)]
+    if not printable:
+        return {}
+    anchors = [recs[i]["pdf_rect"] for i in printable]
+    rects = layout_bubbles(pg.rect.width, pg.rect.height, anchors, _body(pg, anchors))
+    return {i: fitz.Rect(r) for i, r in zip(printable, rects)}
+
+
+def _bubble_rect(pg, rect):
+    """Where a lone highlight's tag bubble goes (_draw_page lays out a page's together)"""
+    return fitz.Rect(layout_bubbles(pg.rect.width, pg.rect.height, [tuple(rect)],
+                                    _body(pg, [rect]))[0])
+
+
+def draw_highlight(pg, rec, tags=True, bubble=None, shape=None):
+    """Draw one highlight record (plus tab and bubble if printable) onto a page.
+
+    Pass a page Shape to batch several highlights into one content
+    stream (the caller commits it, and has linked _SharedResources into
+    the page), otherwise this commits its own.
+    """
+    own = shape is None
+    if own:
+        _SharedResources(pg.parent).link(pg)
+        shape = pg.new_shape()
+    rect = fitz.Rect(rec["pdf_rect"])
+    r, g, b, a = [c / 255.0 for c in rec["color"]]
+
+    # Always draw high-quality highlight
+    _fill(shape, rect, (r, g, b), HIGHLIGHT_OPACITY)     # Slightly more visible
+
+    # Draw highlight border for better visibility
+    shape.draw_rect(rect)
+    shape.finish(color=(r * 0.7, g * 0.7, b * 0.7), fill=None, width=1.5)
+
+    if tags and rec["tag"].get("printable", True):
+        # Draw colored tab in left margin
+        tab_height = min(40, max(20, rect.height))
+        tab_x = max(10, rect.x0 - 15)  # Position tab to the left
+        tab = fitz.Rect(tab_x - 12, rect.y0, tab_x - 2, rect.y0 + tab_height)
+        shape.draw_rect(tab)
+        shape.finish(color=(r * 0.8, g * 0.8, b * 0.8), fill=(r, g, b), width=1.5)
+
+        # Add annotation bubble
+        try:
+            _draw_bubble(shape, rect, rec["tag"], bubble or _bubble_rect(pg, rect))
+        except Exception as e:
+            # Continue without bubble if there's an error
+            print(f"Error creating annotation bubble: {e}")
+
+    if own:
+        shape.commit(overlay=True)
+
+
+def _draw_bubble(shape, rect, tag, bubble_rect):
+    # Draw bubble background with border
+    _fill(shape, bubble_rect, (0.95, 0.95, 0.95), BUBBLE_OPACITY)
+    shape.draw_rect(bubble_rect)
+    shape.finish(color=(0.3, 0.3, 0.3), fill=None, width=1)
+
+    # Insert text in bubble
+    text_rect = fitz.Rect(bubble_rect.x0 + 4, bubble_rect.y0 + 3,
+                          bubble_rect.x1 - 4, bubble_rect.y1 - 3)
+    _insert_fitted(shape, text_rect, _bubble_text(tag))
+
+    # Draw connector line from highlight to bubble (whichever side it's on)
+    mid_y = rect.y0 + rect.height / 2
+    bubble_mid = bubble_rect.y0 + bubble_rect.height / 2
+    if bubble_rect.x0 >= rect.x1:
+        shape.draw_line(fitz.Point(rect.x1, mid_y), fitz.Point(bubble_rect.x0, bubble_mid))
+    elif bubble_rect.x1 <= rect.x0:
+        shape.draw_line(fitz.Point(rect.x0, mid_y), fitz.Point(bubble_rect.x1, bubble_mid))
+    elif bubble_rect.y0 >= rect.y1:     # bottom band
+        shape.draw_line(fitz.Point((rect.x0 + rect.x1) / 2, rect.y1),
+                        fitz.Point((bubble_rect.x0 + bubble_rect.x1) / 2, bubble_rect.y0))
+    else:
+        return
+    shape.finish(color=(0.5, 0.5, 0.5), width=1)
+
+
+def _insert_fitted(shape, rect, text):
+    """insert_textbox writes nothing when the text doesn't fit (narrow margin
+    bubbles): shrink the font, then shorten the text until it does"""
+    for fontsize in (8, 6.5, 5):
+        if shape.insert_textbox(rect, text, fontsize=fontsize, fontname=BUBBLE_FONT,
+                                color=(0.1, 0.1, 0.1), align=0) >= 0:
+            return
+    n = len(text)
+    while n > 4:
+        n = n * 3 // 4
+        if shape.insert_textbox(rect, text[:n].rstrip() + "...", fontsize=5,
+                                fontname=BUBBLE_FONT, color=(0.1, 0.1, 0.1), align=0) >= 0:
+            return
+
+
+def _bubble_fontsize(rect):
+    return 8 if rect.width >= 150 else 6.5 if rect.width >= 90 else 5
+
+
+# -------- shared page resources --------
+def _gstate_name(fill_opacity):
+    """Resource name of our fill-opacity graphics state"""
+    return f"BTca{min(99, int(round(fill_opacity * 100))):02d}"
+
+
+def _fill(shape, rect, rgb, opacity):
+    """Fill rect see-through, straight into the shape's content (so after a
+    finish(), never between draw and finish): Shape's own fill_opacity would
+    go through a graphics state named and made by PyMuPDF internals, ours is
+    the one _SharedResources linked in"""
+    x, y = rect.bl * shape.ipctm
+    shape.totalcont += (f"q /{_gstate_name(opacity)} gs {rgb[0]:g} {rgb[1]:g} {rgb[2]:g} rg "
+                        f"{x:g} {y:g} {rect.width:g} {rect.height:g} re f Q\n")
+
+
+class _SharedResources:
+    """The bubble font and opacity states, one object each per document.
+
+    Shape looks fonts up by name in the page's resources and only adds
+    its own when the name is missing, so linking the font in before
+    drawing makes every page reference the same object instead of
+    growing a copy (and doing the lookup work) per page.  The opacity
+    states are ours alone (_fill draws with them), linked in the same way.
+    Exported highlight annotations share their appearance the same way,
+    one form per color (appearance()).
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.font = None
+        self.gstates = {}       # resource name -> xref, made on first use
+        self.appearances = {}   # (r, g, b, opacity) -> form xref, made on first use
+
+    def appearance(self, rgb, opacity):
+        """xref of a highlight appearance: a unit square filled with rgb,
+        multiplied onto the page; the annotation's /Rect stretches it"""
+        key = (*rgb, opacity)
+        if key not in self.appearances:
+            doc = self.doc
+            xref = doc.get_new_xref()
+            doc.update_object(xref, "<</Type/XObject/Subtype/Form/BBox[0 0 1 1]/Resources"
+                                    f"<</ExtGState<</H<</CA {opacity:g}/ca {opacity:g}"
+                                    "/BM/Multiply>>>>>>>>")
+            doc.update_stream(xref, ("/H gs %g %g %g rg 0 0 1 1 re f" % rgb).encode())
+            self.appearances[key] = xref
+        return self.appearances[key]
+
+    def link(self, pg):
+        doc = self.doc
+        if doc.xref_get_key(pg.xref, "Resources")[0] == "null":
+            # Inherited resources: the page gets its own entry pointing at
+            # them (our names added there are harmless for the other pages)
+            doc.xref_set_key(pg.xref, "Resources", self._inherited(pg.xref))
+        for opacity in (HIGHLIGHT_OPACITY, BUBBLE_OPACITY):
+            name = _gstate_name(opacity)
+            slot = self._slot(pg.xref, f"Resources/ExtGState/{name}")
+            if slot:
+                if name not in self.gstates:
+                    self.gstates[name] = doc.get_new_xref()
+                    doc.update_object(self.gstates[name],
+                                      f"<</Type/ExtGState/CA 1/ca {opacity}>>")
+                doc.xref_set_key(*slot, f"{self.gstates[name]} 0 R")
+        if self.font is None:
+            self.font = pg.insert_font(fontname=BUBBLE_FONT)
+        else:
+            slot = self._slot(pg.xref, f"Resources/Font/{BUBBLE_FONT}")
+            if slot:
+                doc.xref_set_key(*slot, f"{self.font} 0 R")
+
+    def _inherited(self, xref):
+        """Resources a page inherits from its page tree parents"""
+        doc = self.doc
+        while True:
+            kind, value = doc.xref_get_key(xref, "Parent")
+            if kind != "xref":
+                return "<<>>"
+            xref = int(value.split()[0])
+            kind, value = doc.xref_get_key(xref, "Resources")
+            if kind != "null":
+                return value
+
+    def _slot(self, xref, path):
+        """(xref, key) to set path below xref at, following indirect dicts
+        (xref_set_key can't); None if path is already set"""
+        doc = self.doc
+        *dicts, name = path.split("/")
+        prefix = ""
+        for key in dicts:
+            kind, value = doc.xref_get_key(xref, prefix + key)
+            if kind == "xref":
+                xref, prefix = int(value.split()[0]), ""
+            else:
+                prefix += key + "/"
+        if doc.xref_get_key(xref, prefix + name)[0] != "null":
+            return None
+        return xref, prefix + name
+
+
+def _highlight_annot(pg, rec, shared):
+    """Write one highlight annotation object, returns its xref (not yet on the page).
+
+    Unlike pdf_native's it carries no record (BlossomTag is /Export, so
+    read_native skips it and an exported PDF never turns into a tag
+    source) and points at the shared appearance of its color.  It is
+    made as a plain object rather than through PyMuPDF, which would
+    build an appearance of its own for every annotation at save.
+    """
+    r, g, b, a = [c / 255.0 for c in rec["color"]]
+    opacity = max(a, 0.3)
+    x0, y0, x1, y1 = fitz.Rect(rec["pdf_rect"]) * ~pg.transformation_matrix
+    tag = rec["tag"]
+    doc = pg.parent
+    xref = doc.get_new_xref()
+    doc.update_object(xref, (
+        f"<</Type/Annot/Subtype/Highlight/F 4/P {pg.xref} 0 R"
+        f"/Rect[{x0:g} {y0:g} {x1:g} {y1:g}]"
+        f"/QuadPoints[{x0:g} {y1:g} {x1:g} {y1:g} {x0:g} {y0:g} {x1:g} {y0:g}]"
+        f"/C[{r:g} {g:g} {b:g}]/CA {opacity:g}"
+        f"/T{fitz.get_pdf_str(str(tag.get('title', '')))}"
+        f"/Contents{fitz.get_pdf_str(str(tag.get('desc', '')))}"
+        f"/Subj({BT_KEY})/{BT_KEY}/Export"
+        f"/AP<</N {shared.appearance((r, g, b), opacity)} 0 R>>>>"))
+    return xref
+
+
+def _add_annots(pg, xrefs):
+    """Put annotation objects on a page, below the ones it has"""
+    if not xrefs:
+        return
+    doc = pg.parent
+    refs = " ".join(f"{x} 0 R" for x in xrefs)
+    kind, value = doc.xref_get_key(pg.xref, "Annots")
+    if kind == "xref":
+        array = int(value.split()[0])
+        doc.update_object(array, f"[{refs} {doc.xref_object(array, compressed=True)[1:]}")
+    elif kind == "array":
+        doc.xref_set_key(pg.xref, "Annots", f"[{refs} {value[1:]}")
+    else:
+        doc.xref_set_key(pg.xref, "Annots", f"[{refs}]")
+
+
+def annotate_highlight(pg, rec, tags=True, bubble=None, shared=None):
+    """Add one highlight record as native annotations (plus a free-text bubble if printable).
+
+    shared is the document's _SharedResources, if the caller keeps one.
+    """
+    _add_annots(pg, [_highlight_annot(pg, rec, shared or _SharedResources(pg.parent))])
+    _annotate_bubble(pg, rec, tags, bubble)
+
+
+def _annotate_bubble(pg, rec, tags, bubble):
+    if not tags or not rec["tag"].get("printable", True):
+        return
+    bubble = bubble or _bubble_rect(pg, fitz.Rect(rec["pdf_rect"]))
+    note = pg.add_freetext_annot(bubble, _bubble_text(rec["tag"]),
+                                 fontsize=_bubble_fontsize(bubble), fontname=BUBBLE_FONT,
+                                 text_color=(0.1, 0.1, 0.1), fill_color=(0.95, 0.95, 0.95))
+    pg.parent.xref_set_key(note.xref, BT_KEY, "/Bubble")
+
+
+def _by_page(records):
+    pages = {}
+    for rec in records:
+        pages.setdefault(rec["page"], []).append(rec)
+    return pages
+
+
+def _set_contents(pg, xrefs):
+    pg.parent.xref_set_key(pg.xref, "Contents", "[%s]" % " ".join(f"{x} 0 R" for x in xrefs))
+
+
+def _draw_page(pg, recs, style=STYLE_DRAWN, tags=True, shared=None):
+    """Draw a page's highlights (into one content stream marked as ours).
+
+    shared is the document's _SharedResources, if the caller keeps one.
+    """
+    bubbles = _bubbles(pg, recs, tags)
+    if style == STYLE_ANNOTS:
+        shared = shared or _SharedResources(pg.parent)
+        marks = []
+        for i, rec in enumerate(recs):
+            try:
+                marks.append(_highlight_annot(pg, rec, shared))
+                _annotate_bubble(pg, rec, tags, bubbles.get(i))
+            except Exception as e:
+                print(f"Error processing highlight {rec.get('id')}: {e}")
+        _add_annots(pg, marks)
+        return
+
+    (shared or _SharedResources(pg.parent)).link(pg)
+    before = set(pg.get_contents())
+    shape = pg.new_shape()
+    for i, rec in enumerate(recs):
+        try:
+            draw_highlight(pg, rec, tags, bubbles.get(i), shape)
+        except Exception as e:
+            print(f"Error processing highlight {rec.get('id')}: {e}")
+    shape.commit(overlay=True)
+    for xref in pg.get_contents():
+        if xref not in before:
+            pg.parent.xref_set_key(xref, BT_KEY, "true")
+
+
+def _undraw_page(pg):
+    """Drop our annotations and marked content streams (the page's own content stays)"""
+    strip_page(pg)
+    doc = pg.parent
+    _set_contents(pg, [x for x in pg.get_contents() if doc.xref_get_key(x, BT_KEY)[0] == "null"])
+
+
+# -------- re-export state --------
+def _page_hashes(pages, style, tags):
+    return {str(pno): hashlib.sha1(json.dumps(
+                [DRAW_VERSION, style, tags, sorted(recs, key=lambda r: r["id"])],
+                sort_keys=True).encode('utf-8')).hexdigest()[:16]
+            for pno, recs in pages.items()}
+
+
+def _fingerprint(src):
+    """Identify the source PDF as it is now: path, page count, both /ID
+    elements (the second changes with every save that updates it) and
+    size + mtime, which change with any edit, incremental saves included"""
+    with fitz.open(src) as doc:
+        kind, value = doc.xref_get_key(-1, "ID")
+        pages = len(doc)
+    st = os.stat(src)
+    return {"source": str(Path(src).resolve()), "pages": pages,
+            "id": value if kind == "array" else "",
+            "file": f"{st.st_size}:{st.st_mtime_ns}"}
+
+
+def _read_state(doc):
+    kind, value = doc.xref_get_key(doc.pdf_catalog(), EXPORT_KEY)
+    try:
+        return json.loads(value) if kind == "string" else None
+    except ValueError:
+        return None
+
+
+def _write_state(doc, fingerprint, hashes, output):
+    doc.xref_set_key(doc.pdf_catalog(), EXPORT_KEY, fitz.get_pdf_str(
+        json.dumps({"fingerprint": fingerprint, "pages": hashes, "output": output},
+                   separators=(",", ":"))))
+
+
+def _open(src):
+    """Open a path or PDF bytes; a Document is copied so the caller's stays untouched"""
+    if isinstance(src, fitz.Document):
+        src = src.tobytes()
+    if isinstance(src, (bytes, bytearray)):
+        return fitz.open(stream=src, filetype="pdf")
+    return fitz.open(src)
+
+
+def _downsample(doc, dpi):
+    """Re-encode photo (JPEG) images shown at well above dpi down to dpi.
+
+    Lossless images (line art, screenshots) are left alone: as JPEGs
+    they come out blurrier and often bigger.
+    """
+    if not hasattr(doc, "rewrite_images"):
+        print("Image downsampling needs a newer PyMuPDF, skipped")
+        return
+    doc.rewrite_images(dpi_threshold=dpi + dpi // 2, dpi_target=dpi, quality=80,
+                       lossless=False)
+
+
+def export_annotated(src, records, out, progress=None, cancelled=None, workers=1,
+                     incremental=True, style=STYLE_DRAWN, tags=True,
+                     profile=PROFILE_BALANCED, downsample=None):
+    """Write src (a path, PDF bytes or a Document) with records baked in to out.
+
+    style is STYLE_DRAWN or STYLE_ANNOTS, tags=False leaves out tabs
+    and bubbles (highlights only).  profile is one of PROFILES;
+    downsample is a target dpi for images (None keeps them as they are).
+
+    progress(done, total) is called as annotated pages are finished,
+    cancelled() is polled between pages and raises ExportCancelled when
+    it returns True.  workers > 1 (None: one per core) allows the
+    parallel path for documents with many annotated pages.  If out is
+    an earlier export of the same src with the same profile, only
+    changed pages are redrawn (unless incremental is False).
+
+    Returns {"profile", "incremental", "pages" (redrawn), "seconds", "bytes"};
+    an incremental export with 0 pages found out already up to date.
+    """
+    t0 = time.perf_counter()
+    pages = _by_page(records)
+    look = (style, tags)
+    hashes = _page_hashes(pages, *look)
+    output = [profile, downsample]
+    fingerprint = None
+    if isinstance(src, (str, os.PathLike)):
+        fingerprint = _fingerprint(src)
+        redrawn = (_export_incremental(fingerprint, pages, hashes, look, output, out,
+                                       progress, cancelled) if incremental else None)
+        if redrawn is not None:
+            return _stats(profile, True, redrawn, t0, out)
+    workers = workers or os.cpu_count() or 1
+    parallel = workers > 1 and len(pages) >= PARALLEL_MIN_PAGES
+
+    out = Path(out)
+    tmp = out.with_name(out.name + ".part")
+    with tempfile.TemporaryDirectory(prefix="atnolol-export-") as scratch:
+        if parallel and not isinstance(src, (str, os.PathLike)):
+            # Workers open the source by path
+            path = Path(scratch) / "source.pdf"
+            path.write_bytes(src if isinstance(src, (bytes, bytearray)) else src.tobytes())
+            src = str(path)
+        doc = (_export_parallel(src, pages, look, workers, scratch, progress, cancelled)
+               if parallel else _export_serial(src, pages, look, progress, cancelled))
+        try:
+            if downsample:
+                _downsample(doc, downsample)
+            if fingerprint:
+                _write_state(doc, fingerprint, hashes, output)
+            # Save next to the target, then swap it in
+            try:
+                doc.save(tmp, **PROFILES[profile])
+            except Exception:
+                doc.save(tmp)
+            if cancelled and cancelled():
+                raise ExportCancelled()
+            os.replace(tmp, out)
+        finally:
+            doc.close()
+            tmp.unlink(missing_ok=True)
+    return _stats(profile, False, len(pages), t0, out)
+
+
+def _stats(profile, incremental, pages, t0, out):
+    return {"profile": profile, "incremental": incremental, "pages": pages,
+            "seconds": time.perf_counter() - t0, "bytes": os.path.getsize(out)}
+
+
+def _export_incremental(fingerprint, pages, hashes, look, output, out, progress, cancelled):
+    """Redraw the changed pages of an earlier export in place.
+
+    Returns the number of pages redrawn, None if out isn't such an export.
+    """
+    if not Path(out).exists():
+        return None
+    try:
+        doc = fitz.open(out)
+    except Exception:
+        return None
+    try:
+        state = _read_state(doc)
+        if (not state or state.get("fingerprint") != fingerprint
+                or state.get("output") != output or not doc.can_save_incrementally()):
+            return None
+        old = state.get("pages", {})
+        changed = sorted(int(p) for p in set(old) | set(hashes) if old.get(p) != hashes.get(p))
+        shared = _SharedResources(doc)
+        for done, pno in enumerate(changed, 1):
+            if cancelled and cancelled():
+                raise ExportCancelled()
+            pg = doc[pno]
+            _undraw_page(pg)
+            _draw_page(pg, pages.get(pno, []), *look, shared)
+            if progress:
+                progress(done, len(changed))
+        if changed:
+            _write_state(doc, fingerprint, hashes, output)
+            doc.save(str(out), incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+        return len(changed)
+    finally:
+        doc.close()
+
+
+def _export_serial(src, pages, look, progress, cancelled):
+    doc = _open(src)
+    try:
+        # Highlights get drawn below, drop their native annotation copies
+        strip_native(doc)
+        shared = _SharedResources(doc)
+        total = len(pages)
+        for done, (pno, recs) in enumerate(sorted(pages.items()), 1):
+            if cancelled and cancelled():
+                raise ExportCancelled()
+            _draw_page(doc[pno], recs, *look, shared)
+            if progress:
+                progress(done, total)
+        return doc
+    except BaseException:
+        doc.close()
+        raise
+
+
+# ───────────────────────── In-memory export ─────────────────────────
+class _Sink(io.RawIOBase):
+    """File object over anything with write().  MuPDF only needs tell()
+    (it never seeks back), counted from 0 so xref offsets stay right
+    even if the target already holds other data."""
+
+    def __init__(self, target, chunk=1 << 16):
+        super().__init__()
+        self.target, self.chunk = target, chunk
+        self.pos, self.buf = 0, bytearray()
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def write(self, data):
+        self.buf += data
+        self.pos += len(data)
+        if len(self.buf) >= self.chunk:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self.buf:
+            self.target.write(bytes(self.buf))
+            self.buf.clear()
+
+
+def export_to_stream(src, records, stream, progress=None, cancelled=None,
+                     style=STYLE_DRAWN, tags=True, profile=PROFILE_BALANCED, downsample=None):
+    """Write src (a path, PDF bytes or a Document) with records baked in to
+    stream, any object with write().  Nothing touches the disk and
+    nothing is written if the export fails or is cancelled.  Returns the
+    number of bytes written.
+    """
+    doc = _export_serial(src, _by_page(records), (style, tags), progress, cancelled)
+    try:
+        if downsample:
+            _downsample(doc, downsample)
+        sink = _Sink(stream)
+        doc.save(sink, **PROFILES[profile])
+        sink.flush()
+        return sink.pos
+    finally:
+        doc.close()
+
+
+def export_bytes(src, records, **options):
+    """export_to_stream() into memory, returns the annotated PDF's bytes"""
+    buf = io.BytesIO()
+    export_to_stream(src, records, buf, **options)
+    return buf.getvalue()
+
+
+def iter_page_pdfs(src, records, pages=None, style=STYLE_DRAWN, tags=True,
+                   profile=PROFILE_BALANCED):
+    """Yield (page number, one-page annotated PDF bytes) for pages (default:
+    all), annotating each only when it's asked for, so memory stays at
+    one page however large the document.
+    """
+    by_page = _by_page(records)
+    with _open(src) as doc:
+        for pno in range(len(doc)) if pages is None else pages:
+            strip_page(doc[pno])
+            with fitz.open() as one:
+                one.insert_pdf(doc, from_page=pno, to_page=pno)
+                _draw_page(one[0], by_page.get(pno, []), style, tags)
+                data = one.tobytes(**PROFILES[profile])
+            yield pno, data
+
+
+# ───────────────────────── Parallel export ─────────────────────────
+def _page_ranges(annotated, page_count, n):
+    """Split 0..page_count-1 into n contiguous ranges with similar annotated page counts"""
+    n = max(1, min(n, len(annotated)))
+    starts = [0] + [annotated[len(annotated) * i // n] for i in range(1, n)]
+    ends = [s - 1 for s in starts[1:]] + [page_count - 1]
+    return list(zip(starts, ends))
+
+
+def _stitchable(doc):
+    """Whether ranges of doc can be exported apart and stitched back losslessly"""
+    catalog = doc.pdf_catalog()
+    return all(doc.xref_get_key(catalog, key)[0] == "null"
+               for key in ("AcroForm", "Names", "Dests"))
+
+
+def _export_range(src, first, last, pages, look, part):
+    """Worker: copy pages first..last out of src, annotate them, save to part"""
+    with fitz.open(src) as doc, fitz.open() as out:
+        for pno in range(first, last + 1):
+            strip_page(doc[pno])
+        out.insert_pdf(doc, from_page=first, to_page=last)
+        shared = _SharedResources(out)
+        for pno, recs in pages.items():
+            _draw_page(out[pno - first], recs, *look, shared)
+        out.save(part)
+    return len(pages)
+
+
+def _export_parallel(src, pages, look, workers, scratch, progress, cancelled):
+    with fitz.open(src) as doc:
+        stitchable = _stitchable(doc)
+        page_count, toc, metadata = len(doc), doc.get_toc(False), doc.metadata
+        labels = doc.get_page_labels()
+    if not stitchable:
+        return _export_serial(src, pages, look, progress, cancelled)
+
+    annotated = sorted(pages)
+    ranges = _page_ranges(annotated, page_count, workers * CHUNKS_PER_WORKER)
+    parts = [str(Path(scratch) / f"part{i:04d}.pdf") for i in range(len(ranges))]
+    total, done = len(pages), 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(_export_range, src, first, last,
+                               {p: pages[p] for p in annotated if first <= p <= last},
+                               look, part)
+                   for (first, last), part in zip(ranges, parts)}
+        try:
+            while pending:
+                finished, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done += future.result()
+                if finished and progress:
+                    progress(done, total)
+                if cancelled and cancelled():
+                    raise ExportCancelled()
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+    doc = fitz.open()
+    try:
+        for part in parts:
+            with fitz.open(part) as p:
+                doc.insert_pdf(p, links=False)
+        # A part only keeps links into its own range: take them all from the source
+        with fitz.open(src) as source:
+            for pno, page in enumerate(source):
+                for link in page.get_links():
+                    doc[pno].insert_link(link)
+        if toc:
+            doc.set_toc(toc)
+        if labels:
+            doc.set_page_labels(labels)
+        doc.set_metadata(metadata)
+        return doc
+    except BaseException:
+        doc.close()
+        raise
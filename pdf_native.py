@@ -0,0 +1,121 @@
+# pdf_native.py – Highlights as Native PDF Annotations
+# --------------------------------------------------------------------
+# Stores BlossomTag highlights inside the PDF itself as highlight
+# annotations that other viewers can show and edit.  Each annotation
+# carries its full sidecar record as JSON under the "BlossomTag" key of
+# its annotation dictionary, so it can be read back losslessly.
+#
+# sync_native() only deletes / adds the annotations whose record
+# changed, and save_incremental() appends those objects to the end of
+# the file, so persisting a few tags into a 200 MB PDF writes
+# kilobytes instead of rewriting the document.
+
+import json
+import fitz       # PyMuPDF
+
+BT_KEY = "BlossomTag"
+
+
+def _record_json(rec):
+    return json.dumps(rec, sort_keys=True, separators=(",", ":"))
+
+
+def read_native(doc):
+    """Find BlossomTag annotations: {id: (page, xref, record json)}"""
+    found = {}
+    for page in doc:
+        for annot in page.annots(types=[fitz.PDF_ANNOT_HIGHLIGHT]):
+            kind, value = doc.xref_get_key(annot.xref, BT_KEY)
+            if kind != "string":
+                continue
+            try:
+                rec = json.loads(value)
+            except ValueError:
+                continue
+            found[rec["id"]] = (page.number, annot.xref, _record_json(rec))
+    return found
+
+
+def native_records(native):
+    """Records out of a read_native() map, in page order"""
+    recs = [json.loads(js) for _, _, js in native.values()]
+    recs.sort(key=lambda r: r["page"])
+    return recs
+
+
+def add_highlight_annot(page, rec, with_record=True, update=True):
+    """Add one highlight record as a highlight annotation.
+
+    update=False skips building the appearance stream now; MuPDF builds
+    it when the document is saved (much cheaper for bulk exports).
+    """
+    r, g, b, a = [c / 255.0 for c in rec["color"]]
+    annot = page.add_highlight_annot(fitz.Rect(rec["pdf_rect"]).quad)
+    annot.set_colors(stroke=(r, g, b))
+    annot.set_opacity(max(a, 0.3))
+    tag = rec["tag"]
+    annot.set_info(title=str(tag.get("title", "")), content=str(tag.get("desc", "")),
+                   subject=BT_KEY)
+    if update:
+        annot.update()
+    if with_record:
+        page.parent.xref_set_key(annot.xref, BT_KEY, fitz.get_pdf_str(_record_json(rec)))
+    return annot
+
+
+def sync_native(doc, records, native=None):
+    """Make the PDF's BlossomTag annotations match records.
+
+    native is the map from a previous read_native()/sync_native() call
+    (read from the document when omitted).  Returns the updated map and
+    the number of annotations added or removed.
+    """
+    native = dict(read_native(doc) if native is None else native)
+    wanted = {rec["id"]: (rec, _record_json(rec)) for rec in records}
+    changes = 0
+
+    for hid, (pno, xref, js) in list(native.items()):
+        if hid in wanted and wanted[hid][1] == js:
+            continue
+        page = doc[pno]
+        page.delete_annot(page.load_annot(xref))
+        del native[hid]
+        changes += 1
+
+    for hid, (rec, js) in wanted.items():
+        if hid in native:
+            continue
+        annot = add_highlight_annot(doc[rec["page"]], rec)
+        native[hid] = (rec["page"], annot.xref, js)
+        changes += 1
+    return native, changes
+
+
+def strip_page(page):
+    """Remove every annotation BlossomTag made on a page (highlights, export bubbles)"""
+    doc = page.parent
+    ours = [a.xref for a in page.annots() if doc.xref_get_key(a.xref, BT_KEY)[0] != "null"]
+    for xref in ours:
+        page.delete_annot(page.load_annot(xref))
+
+
+def strip_native(doc):
+    """Remove all BlossomTag annotations (e.g. before baking highlights in)"""
+    for page in doc:
+        strip_page(page)
+
+
+def save_incremental(doc):
+    """Append pending changes to the PDF the document was opened from.
+
+    Returns the reopened document: a second incremental save through the
+    same handle writes a broken xref section, so keep using the new one.
+    Annotation xrefs stay valid across the reopen.
+    """
+    if not doc.name or not doc.can_save_incrementally():
+        raise RuntimeError("This PDF can't be saved incrementally "
+                           "(it was repaired or isn't a file on disk)")
+    path = doc.name
+    doc.save(path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    doc.close()
+    return fitz.open(path)
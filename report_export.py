@@ -0,0 +1,134 @@
+# report_export.py – Tag Reports (CSV, JSON Lines, Markdown)
+# --------------------------------------------------------------------
+# Writes the tag data of one or many documents as structured rows:
+# document, highlight id, page, title, description, highlighted text
+# and color ("#rrggbbaa").  Pages are 1-based, as shown in the viewer.
+#
+# Rows are streamed: sidecar.iter_sidecar() reads SQLite stores through
+# a cursor and binary sidecars a page at a time, each row is written as
+# soon as it's read, so a report over a whole library of sidecars runs
+# in flat memory.  The report goes to "<out>.part" first and replaces
+# out when complete.
+#
+# Usage:  python report_export.py tags.csv reviewed/ [--recursive]
+#         python report_export.py tags.md alice.atnolol bob.atnolol
+
+import csv, json, os
+from pathlib import Path
+
+COLUMNS = ("document", "id", "page", "title", "description", "text", "color")
+
+
+def record_rows(document, records):
+    """Report rows (tuples in COLUMNS order) for one document's records"""
+    for rec in records:
+        tag = rec["tag"]
+        yield (document, rec["id"], rec["page"] + 1, str(tag.get("title", "")),
+               str(tag.get("desc", "")), rec["text"],
+               "#%02x%02x%02x%02x" % tuple(rec["color"]))
+
+
+def sidecar_rows(paths):
+    """Report rows for sidecar files, streamed one highlight at a time"""
+    from sidecar import iter_sidecar
+    for path in paths:
+        yield from record_rows(Path(path).with_suffix(".pdf").name, iter_sidecar(path))
+
+
+def find_sidecars(paths, recursive=False):
+    """Sidecar paths from files and folders (folders: every .atnolol or store in them)"""
+    found = []
+    for path in map(Path, paths):
+        if not path.is_dir():
+            found.append(path)
+            continue
+        pattern = "**/*.atnolol*" if recursive else "*.atnolol*"
+        names = set()
+        for p in path.glob(pattern):
+            if p.name.endswith(".atnolol"):
+                names.add(p)
+            elif p.name.endswith(".atnolol.db"):
+                names.add(p.with_name(p.name[:-3]))     # store without a snapshot
+        found.extend(sorted(names))
+    return found
+
+
+# ───────────────────────── Writers ─────────────────────────
+def write_csv(rows, f):
+    writer = csv.writer(f)
+    writer.writerow(COLUMNS)
+    n = 0
+    for n, row in enumerate(rows, 1):
+        writer.writerow(row)
+    return n
+
+
+def write_jsonl(rows, f):
+    n = 0
+    for n, row in enumerate(rows, 1):
+        f.write(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) + "\n")
+    return n
+
+
+def _md(value):
+    return str(value).replace("|", "\\|").replace("\r", "").replace("\n", "<br>").strip()
+
+
+def write_markdown(rows, f):
+    """One table per document (rows arrive grouped by document)"""
+    n, document = 0, None
+    for n, row in enumerate(rows, 1):
+        if row[0] != document:
+            document = row[0]
+            if n > 1:
+                f.write("\n")
+            f.write(f"## {_md(document)}\n\n"
+                    "| Page | Title | Description | Text | Color |\n"
+                    "|---:|---|---|---|---|\n")
+        _, _, page, title, desc, text, color = row
+        f.write(f"| {page} | {_md(title)} | {_md(desc)} | {_md(text)} | `{color}` |\n")
+    return n
+
+
+FORMATS = {".csv": write_csv, ".jsonl": write_jsonl, ".md": write_markdown}
+FILTERS = "CSV (*.csv);;JSON Lines (*.jsonl);;Markdown (*.md)"
+
+
+def write_report(rows, out, fmt=None):
+    """Stream rows into out (format from fmt or out's extension); returns the row count"""
+    out = Path(out)
+    fmt = (fmt or out.suffix).lower()
+    fmt = fmt if fmt.startswith(".") else "." + fmt
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown report format '{fmt}' (use {', '.join(FORMATS)})")
+    tmp = out.with_name(out.name + ".part")
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            n = FORMATS[fmt](rows, f)
+        os.replace(tmp, out)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return n
+
+
+# ───────────────────────── CLI ─────────────────────────
+def main(argv=None):
+    import argparse, time
+
+    ap = argparse.ArgumentParser(description="Write the tags of sidecars as CSV / JSONL / Markdown")
+    ap.add_argument("output", help="report file (.csv, .jsonl or .md)")
+    ap.add_argument("sidecars", nargs="+", help=".atnolol files or folders of them")
+    ap.add_argument("--recursive", action="store_true", help="also look in subfolders")
+    ap.add_argument("--format", choices=[f[1:] for f in FORMATS], help="override the extension")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    paths = find_sidecars(args.sidecars, args.recursive)
+    n = write_report(sidecar_rows(paths), args.output, args.format)
+    print(f"Wrote {n} highlights from {len(paths)} sidecars to {args.output} "
+          f"in {time.perf_counter() - t0:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,281 @@
+# sidecar.py – Annotation Sidecar Files (.atnolol) and Edit Journal
+# --------------------------------------------------------------------
+# The .atnolol file is a full JSON snapshot of a document's highlights.
+# Every add / edit / delete made since that snapshot is appended to
+# "<name>.atnolol.journal" as one JSON op per line, so a single edit
+# costs a few hundred bytes instead of a full rewrite.  Once the journal
+# grows past COMPACT_OPS ops (or COMPACT_BYTES) it is folded back into
+# a fresh snapshot and truncated.
+#
+# Ops are idempotent upserts / deletes keyed by highlight id, so
+# replaying a journal over a snapshot that already contains its ops
+# (crash between snapshot write and journal truncate) is harmless.
+#
+# Writes happen on SIDECAR_WRITER's background thread: snapshots go to
+# a temp file that is fsync'ed and renamed over the sidecar, so a crash
+# mid-write never leaves a truncated .atnolol behind.
+#
+# A snapshot is either JSON or the compact binary layout from
+# sidecar_binary.py; readers tell them apart by the magic bytes.
+
+import json, os, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import sidecar_binary
+
+COMPACT_OPS = 500           # journal ops before compacting into the snapshot
+COMPACT_BYTES = 1 << 20     # ...or journal size in bytes
+
+
+def journal_path(sidecar):
+    """Path of the edit journal that belongs to a sidecar file"""
+    sidecar = Path(sidecar)
+    return sidecar.with_name(sidecar.name + ".journal")
+
+
+def sidecar_is_binary(path):
+    """True if the sidecar snapshot uses the compact binary format"""
+    try:
+        with open(path, 'rb') as f:
+            return sidecar_binary.is_binary(f.read(4))
+    except OSError:
+        return False
+
+
+def read_snapshot(path):
+    """Read a sidecar snapshot (JSON or binary), returns {} if it doesn't exist"""
+    path = Path(path)
+    if not path.exists():
+        return {}
+    if sidecar_is_binary(path):
+        with sidecar_binary.BinarySidecar(path) as reader:
+            return {"original_pdf": reader.original_pdf,
+                    "next_id": reader.next_id,
+                    "highlights": list(reader.records())}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def atomic_write(path, payload: bytes):
+    """Write bytes via temp file + fsync + rename"""
+    path = Path(path)
+    mode = path.stat().st_mode & 0o777 if path.exists() else 0o644
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def encode_snapshot(data, binary=False):
+    """Serialize a sidecar dict to JSON or the compact binary format"""
+    if binary:
+        return sidecar_binary.encode(data)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+def write_snapshot(path, data, binary=False):
+    """Atomically write a full sidecar snapshot"""
+    atomic_write(path, encode_snapshot(data, binary))
+
+
+def apply_journal(records, upserts, deletes):
+    """Apply folded journal ops to a list of highlight records"""
+    return list(iter_journal_applied(records, upserts, deletes))
+
+
+def iter_journal_applied(records, upserts, deletes):
+    """apply_journal() as a generator over any iterable of records"""
+    seen = set()
+    for rec in records:
+        hid = rec["id"]
+        if hid in deletes:
+            continue
+        if hid in upserts:
+            rec = upserts[hid]
+            seen.add(hid)
+        yield rec
+    yield from (rec for hid, rec in upserts.items() if hid not in seen)
+
+
+def journal_next_id(next_id, upserts, deletes):
+    """next_id raised past every id the journal saw, deleted ones included,
+    so ids added after the snapshot are never handed out again"""
+    return max([next_id, *(hid + 1 for hid in upserts), *(hid + 1 for hid in deletes)])
+
+
+def load_sidecar(path):
+    """Read a sidecar snapshot with its journal replayed on top.
+
+    If the document was moved to an SQLite store that store is read
+    instead, it supersedes the snapshot and journal.
+    """
+    from annotation_store import read_store, store_path
+    if store_path(path).exists():
+        return read_store(store_path(path))
+    data = read_snapshot(path)
+    data.setdefault("original_pdf", None)
+    data.setdefault("next_id", 0)
+    upserts, deletes = AnnotationJournal(path).fold()
+    data["highlights"] = apply_journal(data.get("highlights", []), upserts, deletes)
+    data["next_id"] = journal_next_id(data["next_id"], upserts, deletes)
+    return data
+
+
+def iter_sidecar(path):
+    """Yield a sidecar's highlight records (journal applied) one at a time.
+
+    SQLite stores are read through a cursor and binary snapshots a page
+    at a time, so memory stays flat; JSON snapshots are parsed whole.
+    """
+    from annotation_store import iter_store, store_path
+    if store_path(path).exists():
+        yield from iter_store(store_path(path))
+        return
+    upserts, deletes = AnnotationJournal(path).fold()
+    yield from iter_journal_applied(_snapshot_records(path), upserts, deletes)
+
+
+def _snapshot_records(path):
+    path = Path(path)
+    if not path.exists():
+        return
+    if sidecar_is_binary(path):
+        with sidecar_binary.BinarySidecar(path) as reader:
+            yield from reader.records()
+    else:
+        yield from read_snapshot(path).get("highlights", [])
+
+
+def convert_sidecar(src, dst, binary):
+    """Rewrite a sidecar (journal included) as JSON or binary, returns the highlight count"""
+    data = load_sidecar(src)
+    write_snapshot(dst, data, binary)
+    return len(data["highlights"])
+
+
+# ───────────────────────── Edit Journal ─────────────────────────
+class AnnotationJournal:
+    """Append-only log of highlight add/edit/delete ops next to a sidecar"""
+
+    def __init__(self, sidecar):
+        self.sidecar = Path(sidecar)
+        self.path = journal_path(sidecar)
+        self.ops = sum(1 for _ in self.read_ops())
+
+    def append(self, ops):
+        """Append ops ({"op": "add"|"edit", "hl": rec} / {"op": "del", "id": n})"""
+        if not ops:
+            return
+        lines = "".join(json.dumps(op, ensure_ascii=False, separators=(",", ":")) + "\n"
+                        for op in ops)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self.ops += len(ops)
+
+    def read_ops(self):
+        """Yield journal ops in order, skipping a torn last line"""
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def fold(self):
+        """Collapse the journal into (upserts by id, deleted ids)"""
+        upserts, deletes = {}, set()
+        for op in self.read_ops():
+            if op.get("op") == "del":
+                upserts.pop(op["id"], None)
+                deletes.add(op["id"])
+            elif "hl" in op:
+                upserts[op["hl"]["id"]] = op["hl"]
+                deletes.discard(op["hl"]["id"])
+        return upserts, deletes
+
+    def needs_compaction(self):
+        if self.ops >= COMPACT_OPS:
+            return True
+        try:
+            return self.path.stat().st_size >= COMPACT_BYTES
+        except OSError:
+            return False
+
+    def reset(self):
+        """Drop the journal once its ops are part of a snapshot"""
+        self.path.unlink(missing_ok=True)
+        self.ops = 0
+
+
+# ───────────────────────── Background Writer ─────────────────────────
+class SidecarWriter:
+    """One background thread for sidecar writes; saves to the same path coalesce.
+
+    A queued job holds the newest snapshot (a callable, serialized on the
+    worker) plus the journal ops queued after it.  Submitting again before
+    the job starts merges into it: a new snapshot supersedes everything
+    queued so far, plain ops are appended.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._pool = None
+
+    def submit(self, path, snapshot=None, ops=(), journal=None, done=None):
+        """Queue a save; snapshot() returns the encoded bytes, done(error) runs on the worker"""
+        path = str(path)
+        with self._lock:
+            job = self._jobs.get(path)
+            if job is None:
+                job = self._jobs[path] = {"snapshot": None, "ops": [],
+                                          "journal": journal, "done": []}
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=1,
+                                                    thread_name_prefix="sidecar")
+                self._pool.submit(self._run, path)
+            if snapshot is not None:
+                job["snapshot"], job["ops"] = snapshot, []
+            job["ops"].extend(ops)
+            job["journal"] = journal or job["journal"]
+            if done:
+                job["done"].append(done)
+
+    def _run(self, path):
+        with self._lock:
+            job = self._jobs.pop(path)
+        error = None
+        try:
+            if job["snapshot"] is not None:
+                atomic_write(path, job["snapshot"]())
+                if job["journal"] is not None:
+                    job["journal"].reset()
+            if job["ops"]:
+                job["journal"].append(job["ops"])
+        except Exception as e:
+            error = str(e)
+        for done in job["done"]:
+            try:
+                done(error)
+            except Exception as e:
+                print(f"Sidecar save callback failed: {e}")
+
+    def flush(self, timeout=None):
+        """Block until every queued save has been written"""
+        if self._pool is not None:
+            self._pool.submit(lambda: None).result(timeout)
+
+
+SIDECAR_WRITER = SidecarWriter()
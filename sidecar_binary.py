@@ -0,0 +1,176 @@
+# sidecar_binary.py – Compact Binary Sidecar Format
+# --------------------------------------------------------------------
+# Alternative on-disk layout for .atnolol files with large highlight
+# counts.  Highlights are grouped per page behind a page-offset table,
+# so a reader can decode just the page on screen and fetch the rest
+# later.  Rects are float32, colors four bytes.
+#
+#   header    "ATNB" | u16 version | u16 flags | u32 page count
+#             u32 len + utf-8 original PDF path
+#             i64 next highlight id (version 2+)
+#   table     page count x (u32 page | u32 count | u64 offset | u32 length)
+#   blocks    per highlight: i64 id | 4 x f32 rect | 4 x u8 rgba | u8 flags
+#             then u32 len + utf-8 for text, title, desc, color name and
+#             a JSON object holding any other tag keys ("" if none)
+#
+# Usage:  python sidecar_binary.py notes.atnolol notes.bin.atnolol [--to json|binary]
+
+import json, struct
+
+MAGIC = b"ATNB"
+VERSION = 2
+
+_HEADER = struct.Struct("<4sHHI")
+_PAGE = struct.Struct("<IIQI")
+_HL = struct.Struct("<q4f4BB")
+_LEN = struct.Struct("<I")
+_NEXT = struct.Struct("<q")
+
+_PRINTABLE, _HAS_COLOR = 1, 2
+
+
+def is_binary(head: bytes):
+    return head[:4] == MAGIC
+
+
+# -------- encoding --------
+def _pack_str(s):
+    b = s.encode('utf-8')
+    return _LEN.pack(len(b)) + b
+
+
+def _encode_record(rec):
+    tag = dict(rec["tag"])
+    title, desc = tag.pop("title", ""), tag.pop("desc", "")
+    color, printable = tag.pop("color", None), tag.pop("printable", True)
+    flags = (_PRINTABLE if printable else 0) | (_HAS_COLOR if color is not None else 0)
+    return b"".join((
+        _HL.pack(rec["id"], *rec["pdf_rect"], *rec["color"], flags),
+        _pack_str(rec["text"]), _pack_str(title), _pack_str(desc),
+        _pack_str(color or ""),
+        _pack_str(json.dumps(tag, ensure_ascii=False) if tag else ""),
+    ))
+
+
+def encode(data):
+    """Sidecar dict ({"original_pdf", "highlights"}) -> bytes"""
+    pages = {}
+    for rec in data["highlights"]:
+        pages.setdefault(rec["page"], []).append(rec)
+    blocks = [(p, len(recs), b"".join(_encode_record(r) for r in recs))
+              for p, recs in sorted(pages.items())]
+
+    head = (_HEADER.pack(MAGIC, VERSION, 0, len(blocks))
+            + _pack_str(data.get("original_pdf") or "")
+            + _NEXT.pack(data.get("next_id", 0)))
+    offset = len(head) + _PAGE.size * len(blocks)
+    table = []
+    for page, count, blob in blocks:
+        table.append(_PAGE.pack(page, count, offset, len(blob)))
+        offset += len(blob)
+    return b"".join([head, *table, *(blob for _, _, blob in blocks)])
+
+
+# -------- decoding --------
+def _decode_block(page, blob, count):
+    mv, pos, out = memoryview(blob), 0, []
+    for _ in range(count):
+        hid, x0, y0, x1, y1, r, g, b, a, flags = _HL.unpack_from(mv, pos)
+        pos += _HL.size
+        strings = []
+        for _ in range(5):
+            (n,) = _LEN.unpack_from(mv, pos)
+            pos += _LEN.size
+            strings.append(str(mv[pos:pos + n], 'utf-8'))
+            pos += n
+        text, title, desc, color, extra = strings
+
+        tag = {"title": title, "desc": desc}
+        if flags & _HAS_COLOR:
+            tag["color"] = color
+        tag["printable"] = bool(flags & _PRINTABLE)
+        if extra:
+            tag.update(json.loads(extra))
+        out.append({
+            "page": page,
+            "pdf_rect": [round(x0, 3), round(y0, 3), round(x1, 3), round(y1, 3)],
+            "color": [r, g, b, a],
+            "text": text,
+            "tag": tag,
+            "id": hid
+        })
+    return out
+
+
+class BinarySidecar:
+    """Reader that parses header + page table up front and pages on demand"""
+
+    def __init__(self, path):
+        self._f = open(path, 'rb')
+        try:
+            magic, version, _, n_pages = _HEADER.unpack(self._f.read(_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a binary atnoLOL sidecar")
+            if version > VERSION:
+                raise ValueError(f"{path} uses a newer sidecar format (v{version})")
+            (n,) = _LEN.unpack(self._f.read(_LEN.size))
+            self.original_pdf = self._f.read(n).decode('utf-8') or None
+            self.next_id = 0
+            if version >= 2:
+                (self.next_id,) = _NEXT.unpack(self._f.read(_NEXT.size))
+            raw = self._f.read(_PAGE.size * n_pages)
+            self.table = {page: (count, offset, length)
+                          for page, count, offset, length in _PAGE.iter_unpack(raw)}
+        except Exception:
+            self._f.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self._f.close()
+
+    def pages(self):
+        return sorted(self.table)
+
+    def __len__(self):
+        return sum(count for count, _, _ in self.table.values())
+
+    def read_page(self, page):
+        """Decode the highlight records of one page"""
+        if page not in self.table:
+            return []
+        count, offset, length = self.table[page]
+        self._f.seek(offset)
+        return _decode_block(page, self._f.read(length), count)
+
+    def records(self):
+        for page in self.pages():
+            yield from self.read_page(page)
+
+
+# ───────────────────────── Converter CLI ─────────────────────────
+def main(argv=None):
+    import argparse
+    from sidecar import convert_sidecar, sidecar_is_binary
+
+    ap = argparse.ArgumentParser(
+        description="Convert .atnolol sidecars between JSON and the compact binary format")
+    ap.add_argument("src")
+    ap.add_argument("dst")
+    ap.add_argument("--to", choices=("binary", "json"),
+                    help="target format (default: the opposite of src)")
+    args = ap.parse_args(argv)
+
+    binary = (args.to == "binary") if args.to else not sidecar_is_binary(args.src)
+    n = convert_sidecar(args.src, args.dst, binary=binary)
+    print(f"Wrote {n} highlights to {args.dst} ({'binary' if binary else 'json'})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,254 @@
+# sidecar_merge.py – Three-Way Merge of Annotation Sidecars
+# --------------------------------------------------------------------
+# Merges the .atnolol files of several reviewers who tagged copies of
+# the same PDF.  With a base (the sidecar they all started from) the
+# merge is three-way: edits and deletes are taken from whoever made
+# them.  Without one it is a union of everybody's highlights.
+#
+# Matching: a reviewer's highlight belongs to a base highlight with the
+# same id when their rects still overlap, otherwise to the best
+# overlapping highlight (IoU >= MATCH_IOU) on the same page.  Rects are
+# bucketed per page into BAND-high horizontal strips, so each lookup
+# only looks at its neighbours instead of every other highlight.
+#
+# Conflict rules, per field (page, rect, color, text and each tag key):
+#   - changed by one reviewer (or by several the same way): take it
+#   - changed differently: the reviewer listed first wins, reported
+#   - deleted by one, edited by another: the edit wins, reported
+#   - deleted by some, untouched by the rest: deleted
+# A tag key missing from a reviewer's copy of a base highlight counts as
+# removed by that reviewer: it goes unless somebody else edited it.
+# Rects are compared rounded to 0.01 pt (float noise of the binary
+# format), but records are emitted as they were read.
+# Highlights new to the merge keep their id unless it's taken, then
+# they get the next free one.
+#
+# Usage:  python sidecar_merge.py merged.atnolol alice.atnolol bob.atnolol [--base orig.atnolol]
+
+import json
+
+MATCH_IOU = 0.5     # overlap needed to treat two rects as the same highlight
+BAND = 32.0         # bucket height in PDF points
+
+_FIELDS = ("page", "pdf_rect", "color", "text")
+_MISSING = object()     # tag key absent from a version
+
+
+def iou(a, b):
+    """Intersection over union of two [x0, y0, x1, y1] rects"""
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _copy(rec):
+    """Copy of a record the merge can change without touching its input"""
+    return dict(rec, pdf_rect=list(rec["pdf_rect"]), color=list(rec["color"]),
+                tag=dict(rec["tag"]))
+
+
+def _key(value, field=None):
+    """Comparison key of a field value (rects without the binary format's float noise)"""
+    if value is _MISSING:
+        return None
+    if field == "pdf_rect":
+        value = [round(v, 2) for v in value]
+    return json.dumps(value, sort_keys=True)
+
+
+def _content(rec):
+    return _key([_key(rec[f], f) for f in _FIELDS] + [rec["tag"]])
+
+
+# ───────────────────────── Matching ─────────────────────────
+class _PageBands:
+    """Highlight groups bucketed by (page, horizontal band)"""
+
+    def __init__(self):
+        self._bands = {}
+
+    @staticmethod
+    def _span(rect):
+        return range(int(rect[1] // BAND), int(rect[3] // BAND) + 1)
+
+    def add(self, page, rect, item):
+        for band in self._span(rect):
+            self._bands.setdefault((page, band), []).append((rect, item))
+
+    def best(self, page, rect, accept):
+        """Best overlapping item that accept(item) allows, or None"""
+        best, best_iou = None, MATCH_IOU
+        for band in self._span(rect):
+            for other, item in self._bands.get((page, band), ()):
+                score = iou(rect, other)
+                if score >= best_iou and accept(item):
+                    best, best_iou = item, score
+        return best
+
+
+def _group(base, versions):
+    """Match every reviewer's records to base records / each other"""
+    n = len(versions)
+    groups, bands, by_id = [], _PageBands(), {}
+    for rec in base:
+        g = {"base": rec, "versions": [None] * n}
+        groups.append(g)
+        by_id.setdefault(rec["id"], g)
+        bands.add(rec["page"], rec["pdf_rect"], g)
+
+    for k, records in enumerate(versions):
+        free = lambda g: g["versions"][k] is None
+        for rec in records:
+            g = by_id.get(rec["id"])
+            if (g is None or not free(g) or g["base"]["page"] != rec["page"]
+                    or iou(g["base"]["pdf_rect"], rec["pdf_rect"]) == 0):
+                g = bands.best(rec["page"], rec["pdf_rect"], free)
+            if g is None:
+                g = {"base": None, "versions": [None] * n}
+                groups.append(g)
+                bands.add(rec["page"], rec["pdf_rect"], g)
+            g["versions"][k] = rec
+    return groups
+
+
+# ───────────────────────── Resolution ─────────────────────────
+def _pick(base_value, values, field=None):
+    """Three-way pick of one field: (value, conflicting); _MISSING stands
+    for a tag key that isn't there"""
+    base_key = _key(base_value, field) if base_value is not None else None
+    changed = {}
+    for v in values:
+        k = _key(v, field)
+        if k != base_key:
+            changed.setdefault(k, v)
+    if not changed:
+        return base_value, False
+    clash = len(changed) > 1
+    if clash:
+        changed.pop(None, None)     # removed by one, edited by another: the edit wins
+    return next(iter(changed.values())), clash
+
+
+def _resolve(base, present):
+    """Merge the present versions of one highlight field by field"""
+    merged, conflicts = {}, []
+    for field in _FIELDS:
+        merged[field], clash = _pick(base[field] if base else None,
+                                     [v[field] for v in present], field)
+        if clash:
+            conflicts.append(field)
+
+    tag = {}
+    keys = dict.fromkeys(k for rec in ([base] if base else []) + present for k in rec["tag"])
+    for name in keys:
+        if base:
+            # A key one reviewer dropped is a change like any other
+            value, clash = _pick(base["tag"].get(name, _MISSING),
+                                 [v["tag"].get(name, _MISSING) for v in present])
+        else:
+            value, clash = _pick(_MISSING, [v["tag"][name] for v in present if name in v["tag"]])
+        if value is not _MISSING:
+            tag[name] = value
+        if clash:
+            conflicts.append(f"tag.{name}")
+    merged["tag"] = tag
+    return merged, conflicts
+
+
+def merge_records(versions, base=None):
+    """Merge lists of highlight records; returns (records, report)"""
+    base = [_copy(r) for r in (base or [])]
+    versions = [[_copy(r) for r in records] for records in versions]
+    report = {"kept": 0, "added": 0, "edited": 0, "deleted": 0,
+              "conflicts": [], "renumbered": {}}
+    out, fresh, clashes = [], [], []
+
+    for g in _group(base, versions):
+        b = g["base"]
+        present = [v for v in g["versions"] if v is not None]
+        fields = []
+        if b is not None:
+            edited = any(_content(v) != _content(b) for v in present)
+            if len(present) < len(versions):
+                if not edited:
+                    report["deleted"] += 1
+                    continue
+                fields.append("deleted")
+            if not edited:
+                out.append(b)
+                report["kept"] += 1
+                continue
+
+        rec, changed = _resolve(b, present)
+        fields += changed
+        if b is not None:
+            rec["id"] = b["id"]
+            report["edited"] += 1
+        else:
+            rec["id"] = present[0]["id"]
+            fresh.append(rec)
+            report["added"] += 1
+        if fields:
+            clashes.append((rec, fields))
+        out.append(rec)
+
+    # New highlights keep their id unless a base (or earlier new) one has it
+    used = {r["id"] for r in base}
+    next_id = max([r["id"] for r in out], default=-1) + 1
+    for rec in fresh:
+        if rec["id"] in used:
+            report["renumbered"].setdefault(rec["id"], []).append(next_id)
+            rec["id"], next_id = next_id, next_id + 1
+        used.add(rec["id"])
+
+    report["conflicts"] = [{"id": rec["id"], "page": rec["page"], "fields": fields}
+                           for rec, fields in clashes]
+    return out, report
+
+
+def merge_sidecars(paths, base=None):
+    """Merge sidecar files (journals and SQLite stores included): (data, report)"""
+    from sidecar import load_sidecar
+    datas = [load_sidecar(p) for p in paths]
+    base_data = load_sidecar(base) if base else None
+    records, report = merge_records([d["highlights"] for d in datas],
+                                    base_data["highlights"] if base_data else None)
+    inputs = ([base_data] if base_data else []) + datas
+    pdf = next((d["original_pdf"] for d in inputs if d.get("original_pdf")), None)
+    next_id = max([d.get("next_id", 0) for d in inputs] + [r["id"] + 1 for r in records])
+    return {"original_pdf": pdf, "next_id": next_id, "highlights": records}, report
+
+
+# ───────────────────────── CLI ─────────────────────────
+def main(argv=None):
+    import argparse, time
+    from sidecar import write_snapshot
+
+    ap = argparse.ArgumentParser(
+        description="Merge .atnolol sidecars from several reviewers of the same PDF")
+    ap.add_argument("output")
+    ap.add_argument("sidecars", nargs="+", help="reviewer sidecars, highest priority first")
+    ap.add_argument("--base", help="sidecar the reviewers started from (three-way merge)")
+    ap.add_argument("--binary", action="store_true", help="write the compact binary format")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    data, report = merge_sidecars(args.sidecars, args.base)
+    write_snapshot(args.output, data, args.binary)
+    print(f"Merged {len(args.sidecars)} sidecars into {args.output} in "
+          f"{time.perf_counter() - t0:.2f}s: {len(data['highlights'])} highlights "
+          f"({report['kept']} kept, {report['added']} added, {report['edited']} edited, "
+          f"{report['deleted']} deleted)")
+    for old, new in report["renumbered"].items():
+        print(f"  id {old} was taken, renumbered to {', '.join(map(str, new))}")
+    for c in report["conflicts"]:
+        print(f"  conflict: highlight {c['id']} on page {c['page'] + 1}: {', '.join(c['fields'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,119 @@
+# tag_groups.py – Incremental Tag Aggregates for the Sidebar
+# --------------------------------------------------------------------
+# Buckets highlight ids by page, by color and by tag title (case-
+# insensitive) at the same time, plus the number of printable tags per
+# bucket.  Every add / update / discard moves one id between buckets,
+# so group sizes and filter counts are always current and switching the
+# sidebar between groupings never recounts anything: it walks the
+# buckets it shows (their members only when a filter is on).
+#
+# Buckets are dicts used as ordered sets (id -> None): members stay in
+# the order they were added, removal is O(1).
+#
+# Plain Python, no Qt: colors are keyed by "#rrggbb" strings.
+
+GROUP_NONE, GROUP_PAGE, GROUP_COLOR, GROUP_TITLE = "none", "page", "color", "title"
+GROUPINGS = (GROUP_PAGE, GROUP_COLOR, GROUP_TITLE)
+
+
+def title_key(title):
+    return " ".join(str(title).split()).casefold()
+
+
+class TagGroups:
+    """Highlight ids by page, color and title, with live counts"""
+
+    def __init__(self):
+        self._keys = {}         # id -> (page, color, title key, printable)
+        self.members = {g: {} for g in GROUPINGS}   # grouping -> key -> {id: None}
+        self.printable = {g: {} for g in GROUPINGS}  # grouping -> key -> printable count
+        self.labels = {}        # title key -> the title as first written
+        self.printable_total = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, hid):
+        return hid in self._keys
+
+    def keys_of(self, hid):
+        """{grouping: key} of a highlight, and whether it's printable"""
+        page, color, title, printable = self._keys[hid]
+        return {GROUP_PAGE: page, GROUP_COLOR: color, GROUP_TITLE: title}, printable
+
+    def add(self, hid, page, color, title, printable=True):
+        """Add a highlight, or move it to the buckets its new values belong to"""
+        keys = (page, color, title_key(title), bool(printable))
+        old = self._keys.get(hid)
+        if old == keys:
+            return
+        self.labels.setdefault(keys[2], str(title))
+        self._keys[hid] = keys
+        for i, grouping in enumerate(GROUPINGS):
+            counts = self.printable[grouping]
+            if old is not None and old[i] == keys[i]:
+                # Same bucket, at most the printable flag changed
+                counts[keys[i]] = counts.get(keys[i], 0) + keys[3] - old[3]
+                continue
+            if old is not None:
+                self._leave(grouping, old[i], hid, old[3])
+            self.members[grouping].setdefault(keys[i], {})[hid] = None
+            counts[keys[i]] = counts.get(keys[i], 0) + keys[3]
+        self.printable_total += keys[3] - (old[3] if old is not None else 0)
+
+    update = add
+
+    def discard(self, hid):
+        old = self._keys.pop(hid, None)
+        if old is None:
+            return
+        for i, grouping in enumerate(GROUPINGS):
+            self._leave(grouping, old[i], hid, old[3])
+        self.printable_total -= old[3]
+
+    def _leave(self, grouping, key, hid, printable):
+        bucket = self.members[grouping][key]
+        del bucket[hid]
+        if printable:
+            self.printable[grouping][key] -= 1
+        if not bucket:
+            del self.members[grouping][key]
+            self.printable[grouping].pop(key, None)
+            if grouping == GROUP_TITLE:
+                self.labels.pop(key, None)
+
+    def clear(self):
+        self._keys.clear()
+        for grouping in GROUPINGS:
+            self.members[grouping].clear()
+            self.printable[grouping].clear()
+        self.labels.clear()
+        self.printable_total = 0
+
+    # -------- queries --------
+    def count(self, grouping, key, printable=None):
+        """Members of a bucket (only the printable / not printable ones if asked)"""
+        total = len(self.members[grouping].get(key, ()))
+        if printable is None:
+            return total
+        shown = self.printable[grouping].get(key, 0)
+        return shown if printable else total - shown
+
+    def passes(self, hid, colors=None, printable=None):
+        """Whether a highlight gets through a color set / printable filter"""
+        _, color, _, prn = self._keys[hid]
+        return ((colors is None or color in colors)
+                and (printable is None or prn == printable))
+
+    def groups(self, grouping, colors=None, printable=None):
+        """[(key, member ids)] of a grouping, keys sorted, filters applied,
+        empty groups left out"""
+        buckets = self.members[grouping]
+        out = []
+        for key in sorted(buckets):
+            ids = buckets[key]
+            if colors is not None or printable is not None:
+                ids = [hid for hid in ids if self.passes(hid, colors, printable)]
+            if ids:
+                out.append((key, list(ids)))
+        return out
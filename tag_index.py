@@ -0,0 +1,248 @@
+# tag_index.py – Incremental Token Index over Tags
+# --------------------------------------------------------------------
+# Backs the sidebar's tag search.  Each highlight's tag title and
+# description and its highlighted text are case-folded once, when the
+# highlight is added or edited, and split into words.  Three maps are
+# kept over the vocabulary, which is far smaller than the tags, so
+# indexing a tag is a handful of set adds:
+#   word    -> ids of the highlights using it
+#   trigram -> words containing it         (substring search)
+#   bigram  -> words containing it, with " " padding at both ends
+#                                          (fuzzy search)
+#
+# search(): plain substring match on title and description.  The words
+# containing the query's longest token (trigram sets intersected, rarest
+# first; short tokens scan the vocabulary) give the candidate ids, and
+# a substring test on the folded tag text confirms them.
+#
+# search_fuzzy(): every query word is matched against the vocabulary,
+# highlighted text included.  Vocabulary words sharing enough padded
+# bigrams with it (an edit breaks at most three) are candidates, the
+# FUZZY_CANDIDATES with most shared bigrams get a bounded edit distance
+# (a swap of two neighbours counts as one edit), and words within the
+# typo budget of the query word's length, or whose prefix is, match.
+# A highlight must match every query word and ranks by the sum of its
+# best distances.
+#
+# The index is updated per highlight (add / update / discard), never
+# rebuilt on a keystroke, and knows only ids: callers fetch the
+# highlights they show from the store.  Results come back cut at limit,
+# with the total match count.
+#
+# Plain Python, no Qt.
+
+import heapq, string
+from collections import Counter
+
+GRAM = 3
+FUZZY_CANDIDATES = 200      # vocabulary words edit-checked per query word
+PUNCT = string.punctuation + "“”‘’«»…–—"
+
+
+def fold(text):
+    """Search form of a string (case-folded, whitespace runs made single spaces)"""
+    return " ".join(str(text).split()).casefold()
+
+
+def _grams(text):
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+def _bigrams(word):
+    word = f" {word} "
+    return {word[i:i + 2] for i in range(len(word) - 1)}
+
+
+def _words_of(*texts):
+    return {w.strip(PUNCT) for text in texts for w in text.split()} - {""}
+
+
+def tag_text(hl):
+    """The substring-searchable text of a highlight: its tag title and description"""
+    tag = hl["tag"]
+    return fold(tag.get("title", "")) + "\n" + fold(tag.get("desc", ""))
+
+
+def typo_budget(length):
+    """Edits tolerated in a query word of length letters"""
+    return 0 if length <= 2 else 1 if length <= 5 else 2
+
+
+def edit_distance(a, b, limit):
+    """(edit distance a -> b, a -> closest prefix of b), neighbour swaps
+    counting as one edit; anything over limit comes back as limit + 1"""
+    n = len(b)
+    prev2, prev = None, list(range(n + 1))
+    for i in range(1, len(a) + 1):
+        ca = a[i - 1]
+        cur = [i] + [0] * n
+        for j in range(1, n + 1):
+            cb = b[j - 1]
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            if prev2 is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                d = min(d, prev2[j - 2] + 1)
+            cur[j] = d
+        if min(cur) > limit:
+            return limit + 1, limit + 1
+        prev2, prev = prev, cur
+    return min(prev[n], limit + 1), min(min(prev), limit + 1)
+
+
+class TagIndex:
+    """Word / n-gram index of highlight tags, kept current one highlight at a time"""
+
+    def __init__(self, hls=()):
+        self._text = {}     # id -> folded tag text
+        self._body = {}     # id -> folded highlighted text
+        self._seq = {}      # id -> insertion number, for result order
+        self._words = {}    # word -> set of ids
+        self._grams = {}    # trigram -> set of words
+        self._pairs = {}    # padded bigram -> set of words
+        self._next = 0
+        self.add_many(hls)
+
+    def __len__(self):
+        return len(self._text)
+
+    def __contains__(self, hid):
+        return hid in self._text
+
+    def add(self, hl):
+        """Index a highlight (re-indexes it if its id is already known)"""
+        hid, text, body = hl["id"], tag_text(hl), fold(hl.get("text", ""))
+        old = self._text.get(hid)
+        if old == text and self._body[hid] == body:
+            return
+        if old is not None:
+            self._unpost(hid, old, self._body[hid])
+        else:
+            self._seq[hid] = self._next
+            self._next += 1
+        self._text[hid], self._body[hid] = text, body
+        words = self._words
+        for word in _words_of(text, body):
+            ids = words.get(word)
+            if ids is not None:
+                ids.add(hid)
+                continue
+            words[word] = {hid}
+            for g in _grams(word):
+                self._grams.setdefault(g, set()).add(word)
+            for g in _bigrams(word):
+                self._pairs.setdefault(g, set()).add(word)
+
+    update = add
+
+    def add_many(self, hls):
+        for hl in hls:
+            self.add(hl)
+
+    def discard(self, hid):
+        text = self._text.pop(hid, None)
+        if text is not None:
+            self._unpost(hid, text, self._body.pop(hid))
+            del self._seq[hid]
+
+    def clear(self):
+        for m in (self._text, self._body, self._seq, self._words, self._grams, self._pairs):
+            m.clear()
+        self._next = 0
+
+    def _unpost(self, hid, text, body):
+        words = self._words
+        for word in _words_of(text, body):
+            ids = words.get(word)
+            if ids is None:
+                continue
+            ids.discard(hid)
+            if ids:
+                continue
+            del words[word]
+            for grams, split in ((self._grams, _grams), (self._pairs, _bigrams)):
+                for g in split(word):
+                    holders = grams.get(g)
+                    if holders is not None:
+                        holders.discard(word)
+                        if not holders:
+                            del grams[g]
+
+    def _ranked(self, hits, key, limit):
+        if limit is None or len(hits) <= limit:
+            return sorted(hits, key=key), len(hits)
+        return heapq.nsmallest(limit, hits, key=key), len(hits)
+
+    # -------- substring search --------
+    def words_containing(self, token):
+        """Indexed words that contain token"""
+        if len(token) < GRAM:
+            return [w for w in self._words if token in w]
+        sets = []
+        for g in _grams(token):
+            holders = self._grams.get(g)
+            if not holders:
+                return []
+            sets.append(holders)
+        sets.sort(key=len)
+        found = sets[0].intersection(*sets[1:])
+        # All of a token's trigrams can occur without the token itself
+        return [w for w in found if token in w] if len(token) > GRAM else list(found)
+
+    def search(self, query, limit=None):
+        """(ids of the highlights whose tag contains query, total match count);
+        ids in insertion order, at most limit of them"""
+        query = fold(query)
+        text = self._text
+        key = max(query.split(), key=len, default="").strip(PUNCT)
+        if not key:
+            hits = [hid for hid, t in text.items() if query and query in t]
+        else:
+            words = self.words_containing(key)
+            candidates = set().union(*(self._words[w] for w in words)) if words else ()
+            hits = [hid for hid in candidates if query in text[hid]]
+        return self._ranked(hits, self._seq.__getitem__, limit)
+
+    # -------- fuzzy search --------
+    def fuzzy_words(self, token):
+        """{vocabulary word: distance} for the words token may be a misspelling
+        (or the misspelled start) of; prefix matches cost half an edit more"""
+        budget = typo_budget(len(token))
+        shared = Counter()
+        for g in _bigrams(token):
+            holders = self._pairs.get(g)
+            if holders:
+                shared.update(holders)
+        need = max(1, len(token) - 3 * budget)
+        found = {}
+        for word, count in shared.most_common(FUZZY_CANDIDATES):
+            if count < need:
+                break
+            if len(word) < len(token) - budget:
+                continue
+            full, prefix = edit_distance(token, word, budget)
+            if full <= budget:
+                found[word] = full
+            elif prefix <= budget and len(word) > len(token):
+                found[word] = prefix + 0.5
+        return found
+
+    def search_fuzzy(self, query, limit=None):
+        """(ids ranked by how closely their title, description or highlighted
+        text matches every word of query, total match count)"""
+        per_token = []
+        for token in {w.strip(PUNCT) for w in fold(query).split()} - {""}:
+            best = {}
+            for word, dist in self.fuzzy_words(token).items():
+                for hid in self._words[word]:
+                    if dist < best.get(hid, dist + 1):
+                        best[hid] = dist
+            if not best:
+                return [], 0
+            per_token.append(best)
+        if not per_token:
+            return [], 0
+        per_token.sort(key=len)
+        first, rest = per_token[0], per_token[1:]
+        score = {hid: dist + sum(other[hid] for other in rest)
+                 for hid, dist in first.items() if all(hid in other for other in rest)}
+        seq = self._seq
+        return self._ranked(list(score), lambda hid: (score[hid], seq[hid]), limit)
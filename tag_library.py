@@ -0,0 +1,210 @@
+# tag_library.py – Persistent Tag Index over a Library of Sidecars
+# --------------------------------------------------------------------
+# Lets tags be searched across folders of .atnolol sidecars without
+# opening their PDFs or loading their highlights.  The index lives in
+# one SQLite file (LIBRARY_PATH) and holds, per document, its sidecar,
+# its PDF and a stamp: mtime and size of the snapshot, the journal and
+# the SQLite store (with its WAL) that make up the sidecar's state.
+#
+# refresh() lists the sidecars of the library's folders and stats them.
+# Only documents whose stamp changed are read again (sidecar.iter_sidecar,
+# one record at a time) and their rows replaced; documents gone from disk
+# are dropped.  Each document is committed on its own, so an interrupted
+# refresh keeps what it finished and the next one picks up the rest.
+# A refresh over an unchanged library is a stat per file.
+#
+# search() is a substring match on tag title and description, like the
+# sidebar's: both are case-folded once, when indexed, and kept in an
+# FTS5 trigram table, so a query of three letters or more is an index
+# lookup rather than a scan of every tag.  SQLite builds without the
+# trigram tokenizer (before 3.34) fall back to scanning the folded text.
+#
+# Plain Python, no Qt.  Connections are per thread: a refresh on a
+# worker thread opens its own TagLibrary on the same file (WAL mode lets
+# searches run meanwhile).
+
+import sqlite3
+from pathlib import Path
+
+from annotation_store import store_path
+from report_export import find_sidecars
+from sidecar import iter_sidecar, journal_path
+from tag_index import fold
+
+LIBRARY_PATH = Path.home() / ".atnolol_library.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    path      TEXT PRIMARY KEY,
+    recursive INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    doc       INTEGER PRIMARY KEY,
+    sidecar   TEXT NOT NULL UNIQUE,
+    pdf       TEXT NOT NULL,
+    stamp     TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tags (
+    rid       INTEGER PRIMARY KEY,
+    doc       INTEGER NOT NULL,
+    id        INTEGER NOT NULL,
+    page      INTEGER NOT NULL,
+    x0 REAL, y0 REAL, x1 REAL, y1 REAL,
+    title     TEXT NOT NULL,
+    descr     TEXT NOT NULL,
+    folded    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tag_doc ON tags(doc);
+"""
+
+_GRAMS = ("CREATE VIRTUAL TABLE IF NOT EXISTS tag_grams USING fts5("
+          "folded, content='tags', content_rowid='rid', tokenize='trigram')")
+
+_HIT_COLS = "d.pdf, d.sidecar, t.id, t.page, t.x0, t.y0, t.x1, t.y1, t.title, t.descr"
+
+
+def sidecar_stamp(sidecar):
+    """mtime / size of every file a sidecar's highlights are read from"""
+    db = store_path(sidecar)
+    parts = []
+    for path in (Path(sidecar), journal_path(sidecar), db, db.with_name(db.name + "-wal")):
+        try:
+            st = path.stat()
+            parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            parts.append("-")
+    return "|".join(parts)
+
+
+def _hit(row):
+    pdf, sidecar, hid, page, x0, y0, x1, y1, title, desc = row
+    return {"pdf": pdf, "sidecar": sidecar, "id": hid, "page": page,
+            "pdf_rect": [x0, y0, x1, y1], "title": title, "desc": desc}
+
+
+class TagLibrary:
+    """Tags of every sidecar in a set of folders, searchable without loading them"""
+
+    def __init__(self, path=LIBRARY_PATH):
+        self.path = str(path)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+        try:
+            self.db.execute(_GRAMS)
+            self.grams = True
+        except sqlite3.OperationalError:
+            self.grams = False      # no trigram tokenizer: scan instead
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    # -------- folders --------
+    def folders(self):
+        """[(folder, recursive)] the library covers"""
+        return [(path, bool(rec)) for path, rec in
+                self.db.execute("SELECT path, recursive FROM folders ORDER BY path")]
+
+    def add_folder(self, folder, recursive=False):
+        self.db.execute("INSERT OR REPLACE INTO folders VALUES (?, ?)",
+                        (str(Path(folder).resolve()), int(recursive)))
+        self.db.commit()
+
+    def remove_folder(self, folder):
+        """Stop covering a folder; its documents go at the next refresh"""
+        self.db.execute("DELETE FROM folders WHERE path = ?", (str(Path(folder).resolve()),))
+        self.db.commit()
+
+    def stats(self):
+        """(documents, tags) indexed"""
+        return (self.db.execute("SELECT COUNT(*) FROM documents").fetchone()[0],
+                self.db.execute("SELECT COUNT(*) FROM tags").fetchone()[0])
+
+    # -------- refresh --------
+    def refresh(self, progress=None, cancelled=None):
+        """Bring the index in line with the sidecars on disk, returns
+        (documents re-read, documents dropped, sidecars that failed to read)"""
+        found = {}
+        for folder, recursive in self.folders():
+            if Path(folder).is_dir():
+                for sidecar in find_sidecars([folder], recursive):
+                    found[str(sidecar)] = sidecar_stamp(sidecar)
+        known = {sidecar: (doc, stamp) for doc, sidecar, stamp in
+                 self.db.execute("SELECT doc, sidecar, stamp FROM documents")}
+
+        dropped = [doc for sidecar, (doc, _) in known.items() if sidecar not in found]
+        for doc in dropped:
+            self._drop(doc)
+            self.db.execute("DELETE FROM documents WHERE doc = ?", (doc,))
+        self.db.commit()
+
+        stale = [s for s, stamp in found.items() if s not in known or known[s][1] != stamp]
+        read = failed = 0
+        for n, sidecar in enumerate(stale):
+            if cancelled and cancelled():
+                break
+            try:
+                self._index(sidecar, found[sidecar], known.get(sidecar, (None,))[0])
+                read += 1
+            except Exception as e:
+                self.db.rollback()
+                failed += 1
+                print(f"Library index error ({sidecar}): {e}")
+            if progress:
+                progress(n + 1, len(stale))
+        return read, len(dropped), failed
+
+    def _index(self, sidecar, stamp, doc):
+        """Replace one document's rows with its sidecar's current records"""
+        if doc is None:
+            doc = self.db.execute("INSERT INTO documents (sidecar, pdf, stamp) VALUES (?, ?, '')",
+                                  (sidecar, str(Path(sidecar).with_suffix(".pdf")))).lastrowid
+        else:
+            self._drop(doc)
+        rows = []
+        for rec in iter_sidecar(sidecar):
+            tag = rec["tag"]
+            title, desc = str(tag.get("title", "")), str(tag.get("desc", ""))
+            rows.append((doc, rec["id"], rec["page"], *rec["pdf_rect"], title, desc,
+                         fold(title) + "\n" + fold(desc)))
+        first = self.db.execute("SELECT IFNULL(MAX(rid), 0) + 1 FROM tags").fetchone()[0]
+        self.db.executemany("INSERT INTO tags (rid, doc, id, page, x0, y0, x1, y1, title, descr, "
+                            "folded) VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                            ((first + i, *row) for i, row in enumerate(rows)))
+        if self.grams:
+            self.db.executemany("INSERT INTO tag_grams (rowid, folded) VALUES (?, ?)",
+                                ((first + i, row[-1]) for i, row in enumerate(rows)))
+        self.db.execute("UPDATE documents SET stamp = ? WHERE doc = ?", (stamp, doc))
+        self.db.commit()
+
+    def _drop(self, doc):
+        if self.grams:
+            # External-content FTS rows are removed with the text they were indexed with
+            self.db.execute("INSERT INTO tag_grams (tag_grams, rowid, folded) "
+                            "SELECT 'delete', rid, folded FROM tags WHERE doc = ?", (doc,))
+        self.db.execute("DELETE FROM tags WHERE doc = ?", (doc,))
+
+    # -------- search --------
+    def search(self, query, limit=None, skip=()):
+        """(hits whose tag title or description contains query, total match
+        count); hits are dicts (pdf, sidecar, id, page, pdf_rect, title, desc)
+        in index order, at most limit of them.  Documents whose PDF is in
+        skip are left out."""
+        query = fold(query)
+        if not query:
+            return [], 0
+        skip = [str(p) for p in skip]
+        where = f"d.pdf NOT IN ({','.join('?' * len(skip))})"
+        if self.grams and len(query) >= 3:
+            source = "tag_grams g JOIN tags t ON t.rid = g.rowid"
+            match = "tag_grams MATCH ?"
+            arg = '"' + query.replace('"', '""') + '"'
+        else:
+            source, match, arg = "tags t", "instr(t.folded, ?) > 0", query
+        tail = f"FROM {source} JOIN documents d ON d.doc = t.doc WHERE {match} AND {where}"
+        total = self.db.execute(f"SELECT COUNT(*) {tail}", (arg, *skip)).fetchone()[0]
+        rows = self.db.execute(f"SELECT {_HIT_COLS} {tail} ORDER BY t.rid LIMIT ?",
+                               (arg, *skip, -1 if limit is None else limit))
+        return [_hit(row) for row in rows], total
@@ -1,22 +1,27 @@
 # ui_components.py – UI Widgets and Dialogs
 # --------------------------------------------------------------------
 
-import textwrap
+import textwrap, time
 from pathlib import Path
 from PySide6.QtCore import (
-    Qt, QPoint, QTimer, QEvent,
-    QPropertyAnimation, QEasingCurve
+    Qt, QPoint, QTimer, QEvent, Signal,
+    QPropertyAnimation, QEasingCurve,
+    QAbstractListModel, QModelIndex, QMargins, QRectF, QSize
 )
 from PySide6.QtGui import (
-    QColor, QPalette, QAction, QFont
+    QColor, QPalette, QAction, QFont, QFontMetrics, QPainter, QPen, QPixmap
 )
 from PySide6.QtWidgets import (
     QApplication, QHBoxLayout, QVBoxLayout,
-    QListWidget, QListWidgetItem, QTabBar,
+    QListWidget, QListWidgetItem, QListView, QTabBar,
     QLabel, QLineEdit, QTextEdit, QPushButton, 
-    QDialog, QCheckBox, QFrame, QMessageBox, QComboBox
+    QDialog, QCheckBox, QFrame, QMessageBox, QComboBox,
+    QStyle, QStyledItemDelegate
 )
 
+from tag_groups import GROUP_COLOR, GROUP_NONE, GROUP_PAGE, GROUP_TITLE, TagGroups
+from tag_index import TagIndex
+
 # ─────────────────────────── THEME ───────────────────────────
 ACCENT = "#C7B0E2"
 HIGHLIGHT_COLORS = {
@@ -255,6 +260,8 @@ class TagDialog(QDialog):
             self.title_edit.setText(data["title"])
             self.desc_edit.setText(data["desc"])
             self.printable_chk.setChecked(data.get("printable", True))
+            if data.get("color") in HIGHLIGHT_COLORS:
+                self.color_combo.setCurrentText(data["color"])
 
         if readonly:
             for w in (self.title_edit, self.desc_edit, self.printable_chk, self.color_combo):
@@ -310,26 +317,79 @@ class TagDialog(QDialog):
         }
 
 # ───────────────────── Tag Search Widget ─────────────────────
+class TagResultsModel(QAbstractListModel):
+    """Search hits as highlight ids; rows are formatted when the view asks"""
+
+    def __init__(self, viewer, parent=None):
+        super().__init__(parent)
+        self.viewer = viewer
+        self._ids = []
+        self._rows = {}     # row -> (text, tooltip), filled lazily
+
+    def set_results(self, ids):
+        self.beginResetModel()
+        self._ids = list(ids)
+        self._rows.clear()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._ids)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role == Qt.UserRole:
+            return self._ids[row]
+        if role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        if row not in self._rows:
+            hl = self.viewer.highlights.get(self._ids[row])
+            if hl is None:
+                return None
+            title = hl["tag"].get("title") or "Untitled"
+            preview = hl["text"][:30] + "..." if len(hl["text"]) > 30 else hl["text"]
+            self._rows[row] = (f"📝 {title}\nPage {hl['page'] + 1}: {preview}",
+                               hl["tag"].get("desc") or title)
+        return self._rows[row][role == Qt.ToolTipRole]
+
+
 class TagSearchWidget(QFrame):
-    """Search tags by title at the top of the sidebar"""
-    
+    """Search tags by title and description at the top of the sidebar,
+    or fuzzily (typos allowed, highlighted text included, best first).
+
+    The tag index follows the viewer's highlight signals, so a keystroke
+    only costs an index lookup, run once typing pauses for DEBOUNCE_MS.
+    After a reset the highlights are indexed in INDEX_SLICE_MS slices
+    between events.  An SQLite store answers plain searches itself, from
+    its own index, and its highlights are only loaded into the tag index
+    once a fuzzy search needs them.  At most RESULT_CAP hits are listed.
+    """
+
+    DEBOUNCE_MS = 120
+    RESULT_CAP = 200
+    INDEX_SLICE_MS = 15
+
     def __init__(self, viewer, parent=None):
         super().__init__(parent)
         self.viewer = viewer
-        self.highlights = []
+        self.index = TagIndex()
+        self._backlog = []      # highlights still to index after a reset
+        self._touched = set()   # ids the signals updated meanwhile
+        self._indexing = True   # False while an SQLite store searches for us
         
         self.setStyleSheet(f"""
             QFrame {{background:#1a1a1a;border:2px solid {ACCENT};border-radius:8px;
                      padding:8px;margin:4px;}}
             QLineEdit {{background:#3a3a3a;border:2px solid {ACCENT};border-radius:6px;
                        color:white;padding:6px;}}
-            QListWidget {{background:#2a2a2a;border:1px solid {ACCENT};border-radius:6px;
-                          max-height:150px;}}
-            QListWidget::item {{background:#3a3a3a;color:white;border-radius:4px;
-                                margin:1px;padding:6px;}}
-            QListWidget::item:selected {{background:{ACCENT};}}
-            QListWidget::item:hover {{background:#4a4a4a;}}
-            QLabel {{color:white;}}
+            QListView {{background:#2a2a2a;border:1px solid {ACCENT};border-radius:6px;
+                        max-height:150px;}}
+            QListView::item {{background:#3a3a3a;color:white;border-radius:4px;
+                              margin:1px;padding:6px;}}
+            QListView::item:selected {{background:{ACCENT};}}
+            QListView::item:hover {{background:#4a4a4a;}}
+            QLabel, QCheckBox {{color:white;}}
         """)
         
         layout = QVBoxLayout(self)
@@ -337,76 +397,494 @@ class TagSearchWidget(QFrame):
         layout.setSpacing(6)
         
         # Header
-        layout.addWidget(QLabel("🔍 Search Tags:"))
+        header = QHBoxLayout()
+        header.addWidget(QLabel("🔍 Search Tags:"))
+        header.addStretch()
+        self.fuzzy_box = QCheckBox("≈ Fuzzy")
+        self.fuzzy_box.setToolTip("Tolerate typos and also search the highlighted text")
+        self.fuzzy_box.toggled.connect(lambda _: self._search_tags())
+        header.addWidget(self.fuzzy_box)
+        layout.addLayout(header)
         
         # Search input
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Type to search tags...")
-        self.search_input.textChanged.connect(self._search_tags)
         layout.addWidget(self.search_input)
+
+        # Search once typing pauses, not on every keystroke
+        self._debounce = QTimer(self, singleShot=True, interval=self.DEBOUNCE_MS)
+        self._debounce.timeout.connect(self._search_tags)
+        self.search_input.textChanged.connect(self._debounce.start)
         
         # Results list (initially hidden)
-        self.results_list = QListWidget()
+        self.model = TagResultsModel(viewer, self)
+        self.results_list = QListView()
+        self.results_list.setModel(self.model)
+        self.results_list.setUniformItemSizes(True)
         self.results_list.setVisible(False)
-        self.results_list.itemDoubleClicked.connect(self._jump_to_tag)
+        self.results_list.doubleClicked.connect(self._jump_to_tag)
         layout.addWidget(self.results_list)
-        
-        # Connect to viewer's highlight creation
-        self.viewer.highlight_created.connect(self._add_highlight)
-    
-    def _add_highlight(self, highlight):
-        """Add a highlight to our search index"""
-        self.highlights.append(highlight)
-    
-    def _search_tags(self, text):
-        """Search tags by title"""
-        text = text.strip().lower()
-        
-        if not text:
-            self.results_list.setVisible(False)
-            return
-        
-        # Find matching highlights
-        matches = []
-        for hl in self.highlights:
-            title = hl["tag"].get("title", "").lower()
-            desc = hl["tag"].get("desc", "").lower()
-            
-            if text in title or text in desc:
-                matches.append(hl)
-        
-        # Update results list
-        self.results_list.clear()
-        
-        if matches:
-            self.results_list.setVisible(True)
-            for hl in matches:
-                title = hl["tag"].get("title", "Untitled")
-                page = hl["page"] + 1
-                preview = hl["text"][:30] + "..." if len(hl["text"]) > 30 else hl["text"]
-                
-                item_text = f"📝 {title}\nPage {page}: {preview}"
-                item = QListWidgetItem(item_text)
-                item.setData(Qt.UserRole, hl)
-                self.results_list.addItem(item)
+        self.count_label = QLabel()
+        self.count_label.setVisible(False)
+        layout.addWidget(self.count_label)
+
+        # Keep the index in step with the viewer's highlights
+        self._index_timer = QTimer(self, singleShot=True, interval=0)
+        self._index_timer.timeout.connect(self._index_more)
+        viewer.highlight_created.connect(self._indexed(self.index.add))
+        viewer.highlight_changed.connect(self._indexed(self.index.update))
+        viewer.highlight_removed.connect(self._indexed(self.index.discard))
+        viewer.highlights_loaded.connect(self._indexed(self.index.add_many))
+        viewer.highlights_reset.connect(self._reindex)
+        self._reindex()
+
+    def _indexed(self, update):
+        """Slot that applies an index update, then refreshes open results"""
+        def slot(arg):
+            if not self._indexing:
+                if self.results_list.isVisible():
+                    self._debounce.start()
+                return
+            if self._backlog:
+                # The backlog's copies are older: don't let them win
+                self._touched.update([arg] if isinstance(arg, int) else
+                                     [arg["id"]] if isinstance(arg, dict) else
+                                     [hl["id"] for hl in arg])
+            update(arg)
+            if self.results_list.isVisible():
+                self._debounce.start()
+        return slot
+
+    def _reindex(self):
+        """Index the viewer's highlights afresh, a slice per event-loop turn
+        (an SQLite store's wait for the first fuzzy search)"""
+        self.index.clear()
+        self._touched.clear()
+        self._backlog = []
+        self._indexing = not self.viewer.highlights.durable
+        if self._indexing:
+            self._index_all()
+
+    def _index_all(self):
+        self._indexing = True
+        self._backlog = list(self.viewer.highlights)
+        self._backlog.reverse()
+        self._index_more()
+
+    def _index_more(self, everything=False):
+        deadline = time.perf_counter() + self.INDEX_SLICE_MS / 1000
+        backlog, touched = self._backlog, self._touched
+        while backlog and (everything or time.perf_counter() < deadline):
+            for hl in backlog[-200:]:
+                if hl["id"] not in touched:
+                    self.index.add(hl)
+            del backlog[-200:]
+        if backlog:
+            self._index_timer.start()
         else:
-            self.results_list.setVisible(False)
+            touched.clear()
     
-    def _jump_to_tag(self, item):
-        """Jump to the selected tag's page"""
-        highlight = item.data(Qt.UserRole)
+    def search(self, query, fuzzy=False, limit=RESULT_CAP):
+        """(ids of the viewer's highlights matching query, total match count)"""
+        store = self.viewer.highlights
+        if store.durable and not fuzzy:
+            return store.search(query, limit)
+        if not self._indexing:
+            self._index_all()
+        if self._backlog:
+            self._index_more(everything=True)
+        search = self.index.search_fuzzy if fuzzy else self.index.search
+        return search(query, limit)
+
+    def _search_tags(self):
+        """List the tags matching the search text (substring or fuzzy)"""
+        ids, total = self.search(self.search_input.text(), self.fuzzy_box.isChecked())
+        self.model.set_results(ids)
+        self.results_list.setVisible(bool(ids))
+        self.count_label.setText(f"Showing {len(ids)} of {total} tags")
+        self.count_label.setVisible(total > len(ids))
+    
+    def _jump_to_tag(self, index):
+        """Jump to the selected tag's highlight"""
+        highlight = self.viewer.highlights.get(index.data(Qt.UserRole))
         if highlight:
-            self.viewer.jump_to_page(highlight["page"])
+            self.viewer.jump_to_rect(highlight["page"], highlight["pdf_rect"])
             # Clear search after jumping
+            self._debounce.stop()
             self.search_input.clear()
             self.results_list.setVisible(False)
+            self.count_label.setVisible(False)
 
 # ───────────────────── Enhanced Sidebar with Search ─────────────────────
+def color_name(key):
+    """Palette name of a "#rrggbb" highlight color (the code itself if it has none)"""
+    for name, color in HIGHLIGHT_COLORS.items():
+        if color.name() == key:
+            return name
+    return key
+
+
+GROUP_ROLE = Qt.UserRole + 1    # True on group header rows
+
+
+class TagListModel(QAbstractListModel):
+    """The sidebar's highlights, flat or grouped by page / color / title and
+    filtered by color / printable flag.
+
+    Rows are highlight ids, plus (key, count) header rows when grouped,
+    kept in slots with an id -> slot map so a single highlight is found,
+    updated or removed without a scan.  A removed row leaves a tombstone
+    in its slot rather than moving the slots below it; a Fenwick tree of
+    live slots turns a slot into a row and back in O(log n), and the
+    slots are compacted once half of them are tombstones.  The flat
+    unfiltered view inserts new rows directly; the other views lay their
+    rows out again from the TagGroups aggregates, at most once per
+    event-loop turn, when a highlight joins or changes group.
+
+    The view gets the rows FETCH_ROWS at a time (canFetchMore/fetchMore)
+    as it scrolls: laying out a row costs a Python call, so a view switch
+    on a large document only pays for the first screenfuls.
+    """
+
+    FETCH_ROWS = 1000
+
+    aggregates_changed = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._order = {}    # every highlight id, in insertion order
+        self._shown = []    # slot -> highlight id, (group key, count) or None (removed)
+        self._slots = {}    # highlight id -> slot
+        self._live = [0]    # Fenwick tree of live slots (1-based)
+        self._dead = 0      # tombstones in _shown
+        self._loaded = 0    # rows handed to the view so far
+        self._info = {}     # highlight id -> what a row shows
+        self.groups = TagGroups()
+        self.grouping, self.colors, self.printable = GROUP_NONE, None, None
+        self._relayout_timer = QTimer(self, singleShot=True, interval=0)
+        self._relayout_timer.timeout.connect(self._relayout)
+
+    @staticmethod
+    def _entry(hl):
+        tag = hl["tag"]
+        return {"title": tag.get("title") or "Untitled", "desc": tag.get("desc", ""),
+                "page": hl["page"], "printable": tag.get("printable", True),
+                "color": hl["color"]}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self._loaded < self._count()
+
+    def fetchMore(self, parent):
+        self.load_rows(self._loaded + self.FETCH_ROWS)
+
+    def load_rows(self, count):
+        """Hand the view the first count rows (if it doesn't have them yet)"""
+        count = min(count, self._count())
+        if count > self._loaded:
+            self.beginInsertRows(QModelIndex(), self._loaded, count - 1)
+            self._loaded = count
+            self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        item = self._shown[self._slot(index.row())]
+        if isinstance(item, tuple):
+            if role == GROUP_ROLE:
+                return True
+            if role == Qt.DisplayRole:
+                return f"{self.group_label(item[0])}  ·  {item[1]}"
+            return None
+        if role == Qt.UserRole:
+            return item
+        if role == GROUP_ROLE:
+            return False
+        info = self._info[item]
+        if role == Qt.DisplayRole:
+            prn = " 🖨️" if info["printable"] else ""
+            return f"{info['title']}{prn}\nPage {info['page'] + 1}"
+        if role == Qt.ToolTipRole:
+            tip = f"Title: {info['title']}\nPage: {info['page'] + 1}"
+            return tip + f"\n\n{info['desc']}" if info["desc"] else tip
+        if role == Qt.DecorationRole:
+            return info["color"]
+        return None
+
+    def group_label(self, key):
+        if self.grouping == GROUP_PAGE:
+            return f"📄 Page {key + 1}"
+        if self.grouping == GROUP_COLOR:
+            return f"🎨 {color_name(key)}"
+        return f"🏷️ {self.groups.labels.get(key, key)}"
+
+    def row_of(self, hid):
+        """Row of a highlight (loaded into the view on the way), None if not shown"""
+        slot = self._slots.get(hid)
+        if slot is None:
+            return None
+        row = self._row(slot)
+        self.load_rows(row + 1)
+        return row
+
+    # -------- slots --------
+    def _count(self):
+        return len(self._shown) - self._dead
+
+    def _index_slots(self):
+        """Drop the tombstones and number the slots again"""
+        if self._dead:
+            self._shown = [item for item in self._shown if item is not None]
+        self._slots = {item: slot for slot, item in enumerate(self._shown)
+                       if not isinstance(item, tuple)}
+        n = len(self._shown)
+        tree = [0] + [1] * n
+        for i in range(1, n + 1):
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self._live, self._dead = tree, 0
+
+    def _row(self, slot):
+        """Row of a live slot: the live slots before it"""
+        if not self._dead:
+            return slot
+        row, tree = 0, self._live
+        while slot:
+            row += tree[slot]
+            slot -= slot & -slot
+        return row
+
+    def _slot(self, row):
+        """Slot of a row: the (row + 1)th live slot"""
+        if not self._dead:
+            return row
+        tree, slot, rest = self._live, 0, row + 1
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            nxt = slot + step
+            if nxt < len(tree) and tree[nxt] < rest:
+                slot, rest = nxt, rest - tree[nxt]
+            step >>= 1
+        return slot
+
+    def _append(self, item):
+        tree = self._live
+        i = len(tree)
+        count, j, low = 1, i - 1, i - (i & -i)
+        while j > low:
+            count += tree[j]
+            j -= j & -j
+        tree.append(count)
+        self._shown.append(item)
+
+    def _bury(self, slot):
+        """Leave a tombstone in a slot, compacting once half are dead"""
+        self._shown[slot] = None
+        self._dead += 1
+        tree, i = self._live, slot + 1
+        while i < len(tree):
+            tree[i] -= 1
+            i += i & -i
+        if self._dead * 2 > len(self._shown):
+            self._index_slots()
+
+    # -------- view --------
+    def _plain(self):
+        return self.grouping == GROUP_NONE and self.colors is None and self.printable is None
+
+    def set_view(self, grouping=GROUP_NONE, colors=None, printable=None):
+        """Group by a tag_groups grouping, show only colors (a set of
+        "#rrggbb") and printable / not printable tags (None: all)"""
+        self.grouping, self.colors, self.printable = grouping, colors, printable
+        self._relayout()
+
+    def _placement(self, hid):
+        """Group and filter verdict of a highlight in the current view"""
+        keys, _ = self.groups.keys_of(hid)
+        return keys.get(self.grouping), self.groups.passes(hid, self.colors, self.printable)
+
+    def _relayout(self):
+        self._relayout_timer.stop()
+        self.beginResetModel()
+        if self.grouping == GROUP_NONE:
+            self._shown = [hid for hid in self._order
+                           if self._plain() or self.groups.passes(hid, self.colors, self.printable)]
+        else:
+            self._shown = []
+            for key, ids in self.groups.groups(self.grouping, self.colors, self.printable):
+                self._shown.append((key, len(ids)))
+                self._shown.extend(ids)
+        self._dead = 0
+        self._index_slots()
+        self._loaded = min(len(self._shown), self.FETCH_ROWS)
+        self.endResetModel()
+
+    # -------- updates (one highlight each) --------
+    def reset(self, hls):
+        self._order, self._info = {}, {}
+        self.groups.clear()
+        for hl in hls:
+            self._store(hl)
+        self._relayout()
+        self.aggregates_changed.emit()
+
+    def _store(self, hl):
+        info = self._info[hl["id"]] = self._entry(hl)
+        self._order[hl["id"]] = None
+        self.groups.add(hl["id"], hl["page"], QColor(info["color"]).name(),
+                        info["title"], info["printable"])
+
+    def add_many(self, hls):
+        """Add new highlights (one row insert when flat), refresh known ones"""
+        new = []
+        for hl in hls:
+            if hl["id"] in self._info:
+                self.update(hl)
+            else:
+                new.append(hl)
+        if not new:
+            return
+        for hl in new:
+            self._store(hl)
+        if self._plain():
+            complete = self._loaded == self._count()
+            for hl in new:
+                self._slots[hl["id"]] = len(self._shown)
+                self._append(hl["id"])
+            if complete:
+                # Show the new rows at once unless the view is still fetching
+                self.load_rows(self._loaded + len(new))
+        else:
+            self._relayout_timer.start()
+        self.aggregates_changed.emit()
+
+    def update(self, hl):
+        hid = hl["id"]
+        if hid not in self._info:
+            self.add_many([hl])
+            return
+        before = self._placement(hid)
+        self._store(hl)
+        if self._placement(hid) == before:
+            slot = self._slots.get(hid)
+            if slot is not None and self._row(slot) < self._loaded:
+                index = self.index(self._row(slot))
+                self.dataChanged.emit(index, index)
+        else:
+            self._relayout_timer.start()
+        self.aggregates_changed.emit()
+
+    def remove(self, hid):
+        if hid not in self._info:
+            return
+        del self._info[hid], self._order[hid]
+        self.groups.discard(hid)
+        slot = self._slots.pop(hid, None)
+        if slot is not None:
+            row = self._row(slot)
+            loaded = row < self._loaded
+            if loaded:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                self._loaded -= 1
+            self._bury(slot)
+            if loaded:
+                self.endRemoveRows()
+        if not self._plain():
+            self._relayout_timer.start()    # group counts
+        self.aggregates_changed.emit()
+
+
+class TagItemDelegate(QStyledItemDelegate):
+    """Paints a sidebar row as a card: title line, page line, color strip"""
+
+    MARGIN, PAD = QMargins(2, 4, 2, 4), 12
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._fonts = None      # (view font, bold font, its metrics)
+        self._cards = {}        # (width, height, ratio, state) -> card pixmap
+
+    def _font(self, option):
+        if self._fonts is None or self._fonts[0] != option.font:
+            font = QFont(option.font)
+            font.setBold(True)
+            self._fonts = (QFont(option.font), font, QFontMetrics(font))
+        return self._fonts[1:]
+
+    def sizeHint(self, option, index):
+        fm = self._font(option)[1]
+        return QSize(option.rect.width(),
+                     2 * fm.lineSpacing() + 2 * self.PAD + self.MARGIN.top() + self.MARGIN.bottom())
+
+    def _card(self, size, ratio, state):
+        """The card background, antialiased once per size and state"""
+        key = (size.width(), size.height(), ratio, state)
+        pm = self._cards.get(key)
+        if pm is None:
+            if len(self._cards) > 12:
+                self._cards.clear()     # view was resized
+            fill, border, width = {"selected": ("#4CAF50", "#66DD75", 2),
+                                   "hover": ("#3a5a4a", "#4CAF50", 1)}.get(
+                                       state, ("#2d4a3a", "#3a5a4a", 1))
+            pm = QPixmap(size * ratio)
+            pm.setDevicePixelRatio(ratio)
+            pm.fill(Qt.transparent)
+            p = QPainter(pm)
+            p.setRenderHint(QPainter.Antialiasing)
+            p.setPen(QPen(QColor(border), width))
+            p.setBrush(QColor(fill))
+            p.drawRoundedRect(QRectF(0.5, 0.5, size.width() - 1, size.height() - 1), 8, 8)
+            p.end()
+            self._cards[key] = pm
+        return pm
+
+    def paint(self, qp, option, index):
+        if index.data(GROUP_ROLE):
+            self._paint_header(qp, option, index)
+            return
+        qp.save()
+        card = QRectF(option.rect.marginsRemoved(self.MARGIN))
+        state = ("selected" if option.state & QStyle.State_Selected else
+                 "hover" if option.state & QStyle.State_MouseOver else "")
+        qp.drawPixmap(card.topLeft(), self._card(card.size().toSize(),
+                                                 qp.device().devicePixelRatioF(), state))
+
+        color = QColor(index.data(Qt.DecorationRole))
+        color.setAlpha(255)
+        qp.fillRect(QRectF(card.x() + 4, card.y() + 6, 4, card.height() - 12), color)
+
+        font, fm = self._font(option)
+        qp.setFont(font)
+        qp.setPen(Qt.white)
+        text = card.adjusted(self.PAD, self.PAD, -self.PAD, -self.PAD).toRect()
+        lines = [fm.elidedText(line, Qt.ElideRight, text.width())
+                 for line in index.data(Qt.DisplayRole).split("\n")]
+        qp.drawText(text, Qt.AlignLeft | Qt.AlignVCenter, "\n".join(lines))
+        qp.restore()
+
+    def _paint_header(self, qp, option, index):
+        """A group header: label and count above an accent rule"""
+        qp.save()
+        font, fm = self._font(option)
+        rect = option.rect.adjusted(6, 0, -6, -self.MARGIN.bottom())
+        qp.setPen(QColor(ACCENT))
+        qp.setFont(font)
+        qp.drawText(rect, Qt.AlignLeft | Qt.AlignBottom,
+                    fm.elidedText(index.data(Qt.DisplayRole), Qt.ElideRight, rect.width()))
+        qp.drawLine(rect.left(), rect.bottom() + 2, rect.right(), rect.bottom() + 2)
+        qp.restore()
+
+
 class TagSidebar(QFrame):
+    """Search box plus the list of all tags (a model, so only visible rows are
+    drawn), grouped and filtered by the combo boxes above it"""
+
     def __init__(self, viewer):
         super().__init__()
         self.viewer = viewer
-        self.highlights = []
         
         # Main layout
         layout = QVBoxLayout(self)
@@ -418,25 +896,37 @@ class TagSidebar(QFrame):
         layout.addWidget(self.search_widget)
         
         # Add the regular tags list
-        self.tags_list = QListWidget()
+        self.model = TagListModel(self)
+        self.tags_list = QListView()
         self.tags_list.setStyleSheet(f"""
-            QListWidget {{background:#1e1e1e;border:2px solid {ACCENT};
-                          border-radius:8px;padding:8px;}}
-            QListWidget::item {{background:#2d4a3a;color:white;font-weight:bold;
-                                border-radius:8px;margin:4px 2px;padding:12px;
-                                border:1px solid #3a5a4a;}}
-            QListWidget::item:selected {{background:#4CAF50;border:2px solid #66DD75;}}
-            QListWidget::item:hover {{background:#3a5a4a;border:1px solid #4CAF50;}}
+            QListView {{background:#1e1e1e;border:2px solid {ACCENT};
+                        border-radius:8px;padding:8px;}}
         """)
+        self.tags_list.setModel(self.model)
+        self.tags_list.setItemDelegate(TagItemDelegate(self.tags_list))
+        self.tags_list.setUniformItemSizes(True)
+        self.tags_list.setMouseTracking(True)     # hover highlight
         
         layout.addWidget(QLabel("📑 All Tags:"))
+        layout.addLayout(self._view_controls())
         layout.addWidget(self.tags_list)
         
         # Connect signals
-        self.viewer.highlight_created.connect(self._add)
-        self.tags_list.itemDoubleClicked.connect(self._jump)
+        self.viewer.highlight_created.connect(lambda hl: self.model.add_many([hl]))
+        self.viewer.highlights_loaded.connect(self.model.add_many)
+        self.viewer.highlight_changed.connect(self.model.update)
+        self.viewer.highlight_removed.connect(self.model.remove)
+        self.viewer.highlights_reset.connect(self._rebuild)
+        self._filters_timer = QTimer(self, singleShot=True, interval=0)
+        self._filters_timer.timeout.connect(self._refresh_filters)
+        self.model.aggregates_changed.connect(self._filters_timer.start)
+        self.model.modelAboutToBeReset.connect(self._keep_current)
+        self.model.modelReset.connect(self._restore_current)
+        self._kept = None
+        self.tags_list.doubleClicked.connect(self._jump)
         self.tags_list.setContextMenuPolicy(Qt.ActionsContextMenu)
         self._ctx()
+        self._rebuild()
 
     def _ctx(self):
         self.tags_list.addAction(QAction("View Details", self,
@@ -445,58 +935,90 @@ class TagSidebar(QFrame):
                                triggered=lambda: self._dlg(False)))
         self.tags_list.addAction(QAction("Delete Tag", self, triggered=self._del))
 
-    def _add(self, hl): 
-        self.highlights.append(hl)
-        self._ref(hl)
-
-    def _ref(self, hl):
-        ttl = hl["tag"]["title"] or "Untitled"
-        prn = " 🖨️" if hl["tag"].get("printable", True) else ""
-        txt = f"{ttl}{prn}\nPage {hl['page'] + 1}"
-        it = next((i for i in self._find_items("", Qt.MatchContains)
-                   if i.data(Qt.UserRole) == hl["id"]), None)
-        if not it:
-            it = QListWidgetItem()
-            self.tags_list.addItem(it)
-            it.setData(Qt.UserRole, hl["id"])
-        it.setText(txt)
-        tip = f"Title: {ttl}\nPage: {hl['page'] + 1}"
-        if hl["tag"]["desc"]: tip += f"\n\n{hl['tag']['desc']}"
-        it.setToolTip(tip)
-
-    def _find_items(self, text, flag):
-        """Helper to find items in the tags list"""
-        items = []
-        for i in range(self.tags_list.count()):
-            item = self.tags_list.item(i)
-            if item:
-                items.append(item)
-        return items
+    def _view_controls(self):
+        row = QHBoxLayout()
+        row.setSpacing(4)
+        self.group_combo = QComboBox()
+        for text, grouping in (("No grouping", GROUP_NONE), ("By page", GROUP_PAGE),
+                               ("By color", GROUP_COLOR), ("By title", GROUP_TITLE)):
+            self.group_combo.addItem(text, grouping)
+        self.color_filter = QComboBox()
+        self.print_filter = QComboBox()
+        for combo in (self.group_combo, self.color_filter, self.print_filter):
+            combo.setStyleSheet(f"""
+                QComboBox {{background:#3a3a3a;border:1px solid {ACCENT};border-radius:6px;
+                           color:white;padding:3px 6px;}}
+            """)
+            combo.currentIndexChanged.connect(self._apply_view)
+            row.addWidget(combo)
+        self._refresh_filters()
+        return row
+
+    def _refresh_filters(self):
+        """Rewrite the filter choices with the current counts"""
+        groups = self.model.groups
+        color, printable = self.color_filter.currentData(), self.print_filter.currentData()
+        colors = groups.members[GROUP_COLOR]
+        for combo in (self.color_filter, self.print_filter):
+            combo.blockSignals(True)
+            combo.clear()
+        self.color_filter.addItem(f"All colors ({len(groups)})", None)
+        for key in sorted(colors, key=color_name):
+            self.color_filter.addItem(f"{color_name(key)} ({len(colors[key])})", key)
+        self.print_filter.addItem(f"All ({len(groups)})", None)
+        self.print_filter.addItem(f"🖨️ Printable ({groups.printable_total})", True)
+        self.print_filter.addItem(f"Not printable ({len(groups) - groups.printable_total})", False)
+        self.color_filter.setCurrentIndex(max(0, self.color_filter.findData(color)))
+        self.print_filter.setCurrentIndex(max(0, self.print_filter.findData(printable)))
+        for combo in (self.color_filter, self.print_filter):
+            combo.blockSignals(False)
+        if self.color_filter.currentData() != color:
+            self._apply_view()      # the filtered color is gone
+
+    def _apply_view(self):
+        color = self.color_filter.currentData()
+        self.model.set_view(self.group_combo.currentData(),
+                            None if color is None else {color},
+                            self.print_filter.currentData())
+
+    def _keep_current(self):
+        index = self.tags_list.currentIndex()
+        self._kept = index.data(Qt.UserRole) if index.isValid() else None
+
+    def _restore_current(self):
+        row = self.model.row_of(self._kept)
+        if row is not None:
+            self.tags_list.setCurrentIndex(self.model.index(row))
+            self.tags_list.scrollTo(self.model.index(row))
+
+    def _rebuild(self):
+        """Repopulate from the viewer's store in one pass"""
+        self.model.reset(self.viewer.highlights)
 
     def _cur(self):
-        it = self.tags_list.currentItem()
-        if not it: return None
-        return next((h for h in self.highlights
-                     if h["id"] == it.data(Qt.UserRole)), None)
+        index = self.tags_list.currentIndex()
+        if not index.isValid(): return None
+        return self.viewer.highlights.get(index.data(Qt.UserRole))
 
     def _jump(self, _): 
         hl = self._cur()
         if hl: 
-            self.viewer.jump_to_page(hl["page"])
+            self.viewer.jump_to_rect(hl["page"], hl["pdf_rect"])
             
     def _dlg(self, ro): 
         hl = self._cur()
         if hl: 
             dlg = TagDialog(ACCENT, hl["tag"], self, ro)
-            dlg.exec()
+            if dlg.exec() == QDialog.Accepted and not ro:
+                # The viewer's highlight_changed signal updates the row
+                self.viewer.update_highlight(hl["id"], dlg.get_data())
             
     def _del(self):
         hl = self._cur()
         if hl and QMessageBox.question(self, "Delete?", "Remove this tag?",
                                        QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
+            # ...and highlight_removed drops it
             self.viewer.remove_highlight(hl["id"])
-            self.highlights.remove(hl)
-            self.tags_list.takeItem(self.tags_list.currentRow())
 
 def setup_app_palette():
     """Set up the dark theme palette for the application"""